@@ -0,0 +1,114 @@
+"""
+Memory and time of listing a large channel through a stub extractor: yt-dlp's processed
+flat listing kept as dicts plus a list of Media (how playlists used to be listed) against
+streaming the listing into an on-disk manifest and reading -n/-r slices back from it.
+Also reports the size of one Media record next to the dataclass it replaced.
+    python benchmarks/bench_listing.py --entries 20000 --limit 50
+Each case runs twice, timed on its own and then under tracemalloc, which slows it down.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from stub_extractor import StubCatalog, stub_factory
+from ydl_pool import YDLPool
+from manifest import PlaylistManifest, manifest_path
+from media import Media
+import youtube
+
+@dataclass
+class DataclassMedia:
+    """The Media layout before it was slotted: a dict per instance and the duration as a string"""
+    id: str
+    title: str
+    duration: str
+    is_from_metadata: bool = False
+    playlist_name: Optional[str] = None
+    info: Optional[dict] = field(default=None, repr=False, compare=False)
+
+def measure(func):
+    """(result, seconds, peak traced bytes) of `func`, from an untraced and a traced call"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def record_bytes(factory, count: int) -> float:
+    """Traced bytes per record for `count` records built by `factory(index)`"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    records = [factory(index) for index in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return (after - before) / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=50, help="-n used for the slices read back")
+    args = parser.parse_args()
+
+    catalog = StubCatalog()
+    for index in range(args.entries):
+        catalog.add(index, f"http://127.0.0.1:1/{index}.mp4", 1)
+    pool = YDLPool(factory=stub_factory(catalog))
+    opts = youtube._playlist_ydl_opts(catalog.playlist_url)
+
+    def list_in_memory():
+        with pool.acquire(opts) as ydl:
+            info = ydl.extract_info(catalog.playlist_url, download=False)
+        name = youtube.sanitize_filename(info['title'])
+        entries = [entry for entry in info['entries'] if entry is not None]
+        return [DataclassMedia(id=entry['id'], title=entry['title'], duration=str(entry.get('duration', '0')),
+                               playlist_name=name) for entry in entries[::-1][:args.limit]], entries
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        manifest = PlaylistManifest(manifest_path(work_dir, catalog.playlist_url))
+
+        def list_to_manifest():
+            youtube._list_playlist(catalog.playlist_url, opts, manifest, 0, pool)
+            return [record for record, _ in manifest.entries(reverse=True, limit=args.limit)]
+
+        (in_memory, _), memory_time, memory_peak = measure(list_in_memory)
+        youtube.console.quiet = True
+        streamed, manifest_time, manifest_peak = measure(list_to_manifest)
+        manifest_size = os.path.getsize(manifest.path)
+
+        _, forward_time, forward_peak = measure(lambda: list(manifest.entries(limit=args.limit)))
+        _, reverse_time, reverse_peak = measure(lambda: list(manifest.entries(reverse=True, limit=args.limit)))
+        _, load_time, _ = measure(lambda: manifest.load())
+
+    assert [media.id for media in in_memory] == [media.id for media in streamed]
+    mb = 1024 * 1024
+    print(f"{args.entries} entries, slices of {args.limit}")
+    print(f"  in-memory listing: {memory_time:6.2f}s, peak {memory_peak / mb:8.1f} MB")
+    print(f"  manifest listing:  {manifest_time:6.2f}s, peak {manifest_peak / mb:8.1f} MB "
+          f"({manifest_size / mb:.1f} MB on disk)")
+    print(f"  manifest -n {args.limit}:    {forward_time * 1000:6.1f} ms, peak {forward_peak / 1024:8.1f} KB")
+    print(f"  manifest -r -n {args.limit}: {reverse_time * 1000:6.1f} ms, peak {reverse_peak / 1024:8.1f} KB")
+    print(f"  manifest reuse:    {load_time * 1000:6.1f} ms to check and count a listing")
+
+    name = "Benchmark Playlist"
+    old = record_bytes(lambda index: DataclassMedia(
+        id=f"v{index:010d}", title=f"Track {index:06d}", duration=str(float(180 + index % 120)),
+        playlist_name=''.join(name)), args.entries)
+    new = record_bytes(lambda index: Media(
+        id=f"v{index:010d}", title=f"Track {index:06d}", duration=180 + index % 120,
+        playlist_name=''.join(name)), args.entries)
+    print(f"  Media record: {new:.0f} bytes vs {old:.0f} bytes as the dataclass "
+          f"({(1 - new / old) * 100:.0f}% smaller)")
+
+if __name__ == "__main__":
+    main()
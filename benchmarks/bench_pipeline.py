@@ -0,0 +1,230 @@
+"""
+End-to-end benchmark of resolve, download and post-processing, fully offline.
+
+A stub extractor answers YouTube URLs with deterministic metadata whose formats
+point at a local media server, so the real code paths in youtube.py and
+downloader.py run unchanged. Each scenario runs in its own process so peak RSS
+is per scenario. Extractions per item counts the extractor round-trips a real site would see:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --scenarios playlist --items 1000 --json before.json
+    python benchmarks/bench_pipeline.py --scenarios playlist --items 1000 --baseline before.json
+
+Scenarios:
+    single     one item through download_media
+    playlist   a playlist listed, resolved and downloaded through the streaming path
+    large      a few large files, optionally over several range connections (--connections)
+
+Items are downloaded as video by default, which has no post-processing step.
+--mode audio encodes a real AAC clip with FFmpeg and converts every item to MP3.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCENARIOS = ("single", "playlist", "large")
+
+def scenario_shape(config: dict):
+    """(item count, bytes per item) for a scenario"""
+    if config['scenario'] == "single":
+        return 1, config['single_mb'] * 1024 * 1024
+    if config['scenario'] == "playlist":
+        return config['items'], config['item_kb'] * 1024
+    return config['large_items'], config['large_mb'] * 1024 * 1024
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def output_bytes(out_dir: str) -> int:
+    """Size of every file written outside the state directory"""
+    total = 0
+    for root, dirs, files in os.walk(out_dir):
+        dirs[:] = [name for name in dirs if name != ".state"]
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def run_scenario(config: dict) -> dict:
+    """Child process: build the server and catalog, run one scenario and measure it"""
+    import downloader
+    import youtube
+    from downloader import YouTubeDownloader
+    from metrics import DOWNLOADS
+    from ydl_pool import YDLPool
+    from media_server import MediaServer
+    from stub_extractor import StubCatalog, stub_factory
+
+    downloader.console.quiet = True
+    youtube.console.quiet = True
+
+    count, size = scenario_shape(config)
+    throttle = int(config['throttle_mb'] * 1024 * 1024) if config['throttle_mb'] else None
+
+    with MediaServer(throttle=throttle) as server, tempfile.TemporaryDirectory() as out_dir:
+        catalog = StubCatalog()
+        if config['mode'] == "audio":
+            # 128 kbit/s AAC, so the clip is roughly `size` bytes
+            server.add_tone("tone.m4a", seconds=max(1, size // 16000))
+            size = os.path.getsize(os.path.join(server.root, "tone.m4a"))
+            for index in range(count):
+                catalog.add(index, server.add_link(f"{StubCatalog.video_id(index)}.m4a", "tone.m4a"), size)
+        else:
+            for index in range(count):
+                catalog.add(index, server.add_clip(f"{StubCatalog.video_id(index)}.mp4", size), size)
+
+        pool = YDLPool(factory=stub_factory(catalog))
+        dl = YouTubeDownloader(
+            output_dir=out_dir,
+            min_workers=config['min_workers'],
+            max_workers=config['max_workers'],
+            postprocess_workers=config['postprocess_workers'],
+            use_archive=False,
+            pool=pool,
+            segment_connections=config['connections']
+        )
+        download_video = config['mode'] == "video"
+        download_options = dict(download_video=download_video, keep_video=True, convert_to_audio=False, bitrate='192')
+
+        first_file = {}
+        done = threading.Event()
+
+        def watch_first_file():
+            while not done.is_set():
+                if DOWNLOADS.value() > 0:
+                    first_file['time'] = time.perf_counter() - start
+                    return
+                time.sleep(0.002)
+
+        start = time.perf_counter()
+        watcher = threading.Thread(target=watch_first_file, daemon=True)
+        watcher.start()
+
+        if config['scenario'] == "single":
+            item = next(iter(catalog.items.values()))
+            media = youtube.get_single_video_info(catalog.video_url(item), pool=pool)
+            dl.download_media(media, **download_options)
+        else:
+            dl.download_playlist(
+                youtube.iter_playlist_media(
+                    catalog.playlist_url,
+                    resolve_workers=config['resolve_workers'],
+                    media_format="video" if download_video else "audio",
+                    pool=pool
+                ),
+                **download_options
+            )
+
+        elapsed = time.perf_counter() - start
+        done.set()
+        watcher.join()
+        written = output_bytes(out_dir)
+        pool.close()
+
+    completed = int(DOWNLOADS.value())
+    return {
+        'scenario': config['scenario'],
+        'mode': config['mode'],
+        'items': count,
+        'completed': completed,
+        'elapsed': elapsed,
+        'items_per_s': completed / elapsed if elapsed else 0.0,
+        'mb_per_s': written / elapsed / (1024 * 1024) if elapsed else 0.0,
+        'time_to_first_file': first_file.get('time'),
+        'extractions_per_item': catalog.extractions / count if count else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def run_isolated(config: dict) -> dict:
+    """Run a scenario in a fresh interpreter and return its result"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_path = os.path.join(temp_dir, "config.json")
+        result_path = os.path.join(temp_dir, "result.json")
+        with open(config_path, "w") as f:
+            json.dump(dict(config, result=result_path), f)
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--run", config_path], check=True)
+        with open(result_path) as f:
+            return json.load(f)
+
+def change(current: float, previous: float) -> str:
+    if not previous or current is None:
+        return ""
+    return f" ({(current - previous) / previous * 100:+.0f}%)"
+
+def print_results(results: list, baseline: dict):
+    print(f"{'scenario':<10}{'mode':>6}{'done':>11}{'items/s':>16}{'MB/s':>16}{'first file':>18}{'peak RSS':>18}"
+          f"{'extractions/item':>18}")
+    for result in results:
+        previous = baseline.get(result['scenario'], {})
+        first = result['time_to_first_file']
+        first_text = f"{first:.3f}s" if first is not None else "-"
+        print(
+            f"{result['scenario']:<10}{result['mode']:>6}"
+            f"{result['completed']:>6}/{result['items']:<4}"
+            f"{result['items_per_s']:>9.1f}{change(result['items_per_s'], previous.get('items_per_s')):>7}"
+            f"{result['mb_per_s']:>9.1f}{change(result['mb_per_s'], previous.get('mb_per_s')):>7}"
+            f"{first_text:>11}{change(first, previous.get('time_to_first_file')):>7}"
+            f"{result['peak_rss_mb']:>9.1f}MB{change(result['peak_rss_mb'], previous.get('peak_rss_mb')):>7}"
+            f"{result.get('extractions_per_item', 0.0):>18.1f}"
+        )
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--run":
+        with open(sys.argv[2]) as f:
+            config = json.load(f)
+        result = run_scenario(config)
+        with open(config['result'], "w") as f:
+            json.dump(result, f)
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--mode", choices=("video", "audio"), default="video",
+                        help="audio needs FFmpeg and includes MP3 conversion")
+    parser.add_argument("--single-mb", type=int, default=8, help="Size of the single item")
+    parser.add_argument("--items", type=int, default=1000, help="Playlist length")
+    parser.add_argument("--item-kb", type=int, default=256, help="Size of each playlist item")
+    parser.add_argument("--large-items", type=int, default=2, help="Number of large files")
+    parser.add_argument("--large-mb", type=int, default=128, help="Size of each large file")
+    parser.add_argument("--throttle-mb", type=float, default=None, help="Per-connection server limit in MB/s")
+    parser.add_argument("--connections", type=int, default=1, help="Range connections per file")
+    parser.add_argument("--min-workers", type=int, default=2)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--postprocess-workers", type=int, default=None)
+    parser.add_argument("--resolve-workers", type=int, default=8)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {result['scenario']: result for result in json.load(f)}
+
+    results = []
+    for scenario in args.scenarios:
+        config = dict(vars(args), scenario=scenario)
+        config.pop('json')
+        config.pop('baseline')
+        results.append(run_isolated(config))
+
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Compare yt-dlp's three-step audio chain (FFmpegExtractAudio -> FFmpegMetadata ->
+EmbedThumbnail) with the single-pass FusedAudioPP on synthetic clips.
+
+Reports wall time, FFmpeg runs, bytes FFmpeg wrote (sum of every output file)
+and block writes from the kernel's I/O accounting. Needs FFmpeg; run it on the
+disk you care about, tmpfs reports no block writes:
+    python benchmarks/bench_postprocess.py --items 20 --seconds 240 --dir /mnt/disk/tmp
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import yt_dlp
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from downloader import YouTubeDownloader
+from fused_pp import FusedAudioPP
+from media import Media
+
+class FFmpegCounter:
+    """Wrap FFmpeg runs to count them and the bytes each one writes"""
+
+    def __init__(self):
+        self.runs = 0
+        self.bytes_written = 0
+        self._original = FFmpegPostProcessor.real_run_ffmpeg
+
+    def __enter__(self):
+        counter = self
+
+        def counting_run(pp, input_path_opts, output_path_opts, **kwargs):
+            result = counter._original(pp, input_path_opts, output_path_opts, **kwargs)
+            counter.runs += 1
+            counter.bytes_written += sum(os.path.getsize(path) for path, _ in output_path_opts if path)
+            return result
+
+        FFmpegPostProcessor.real_run_ffmpeg = counting_run
+        return self
+
+    def __exit__(self, *exc):
+        FFmpegPostProcessor.real_run_ffmpeg = self._original
+
+def block_writes() -> int:
+    """Bytes written to storage by finished child processes, as accounted by the kernel"""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_oublock * 512
+
+def make_sources(work_dir: str, seconds: int):
+    """One AAC clip and one WebP cover to copy for every item"""
+    audio = os.path.join(work_dir, "source.m4a")
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+         '-c:a', 'aac', '-b:a', '128k', audio],
+        check=True
+    )
+    cover = os.path.join(work_dir, "source.webp")
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=1280x720', '-frames:v', '1', cover]
+    )
+    if result.returncode != 0:
+        # FFmpeg built without a WebP encoder
+        cover = os.path.join(work_dir, "source.jpg")
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=1280x720', '-frames:v', '1', cover],
+            check=True
+        )
+    return audio, cover
+
+def make_item(run_dir: str, index: int, audio: str, cover: str) -> dict:
+    """Fresh copies of the sources plus the info dict a download would have produced"""
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, f"Track {index:04d}.m4a")
+    thumbnail = os.path.join(run_dir, f"Track {index:04d}{os.path.splitext(cover)[1]}")
+    shutil.copyfile(audio, path)
+    shutil.copyfile(cover, thumbnail)
+    return {
+        'id': f"bench{index:06d}",
+        'title': f"Track {index:04d}",
+        'uploader': "Benchmark Artist",
+        'upload_date': "20240101",
+        'webpage_url': f"https://www.youtube.com/watch?v=bench{index:06d}",
+        'ext': 'm4a',
+        'acodec': 'mp4a.40.2',
+        'vcodec': 'none',
+        'filepath': path,
+        'thumbnails': [{'id': '0', 'url': 'https://example.invalid/cover', 'filepath': thumbnail}],
+        '__postprocessors': [],
+    }
+
+def run(mode: str, opts: dict, items: list, bitrate: str) -> dict:
+    if mode == "fused":
+        opts = {key: value for key, value in opts.items() if key != 'postprocessor_args'}
+        opts['postprocessors'] = []
+    writes_before = block_writes()
+    with yt_dlp.YoutubeDL(opts) as ydl, FFmpegCounter() as counter:
+        start = time.perf_counter()
+        for info in items:
+            if mode == "fused":
+                info['__postprocessors'] = [FusedAudioPP(ydl, 'mp3', bitrate)]
+            info = ydl.post_process(info['filepath'], info)
+            assert info['filepath'].endswith('.mp3'), info['filepath']
+        elapsed = time.perf_counter() - start
+    return {
+        'elapsed': elapsed,
+        'runs': counter.runs,
+        'bytes_written': counter.bytes_written,
+        'block_writes': block_writes() - writes_before,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--seconds", type=int, default=240, help="Length of each clip")
+    parser.add_argument("--bitrate", default="192")
+    parser.add_argument("--dir", default=None, help="Where to write the files (default: system temp dir)")
+    args = parser.parse_args()
+
+    if not shutil.which("ffmpeg"):
+        sys.exit("FFmpeg is required for this benchmark")
+
+    work_dir = tempfile.mkdtemp(prefix="tube-pp-bench-", dir=args.dir)
+    try:
+        audio, cover = make_sources(work_dir, args.seconds)
+        # The exact option set the downloader uses for an audio download
+        opts = YouTubeDownloader(output_dir=os.path.join(work_dir, "output"))._get_ydl_opts(
+            Media(id="bench", title="bench", duration=0), False, bitrate=args.bitrate
+        )
+        opts = dict(opts, keepvideo=False)
+
+        results = {}
+        for mode in ("chain", "fused"):
+            items = [make_item(os.path.join(work_dir, mode), index, audio, cover) for index in range(args.items)]
+            results[mode] = run(mode, opts, items, args.bitrate)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{args.items} items, {args.seconds}s clips, {args.bitrate}k MP3")
+    for mode, result in results.items():
+        print(f"{mode:>6}: {result['elapsed']:7.2f}s, {result['runs'] / args.items:.1f} FFmpeg runs/item, "
+              f"{result['bytes_written'] / args.items / 1024 / 1024:7.2f} MB written/item by FFmpeg, "
+              f"{result['block_writes'] / 1024 / 1024:8.1f} MB block writes")
+    chain, fused = results["chain"], results["fused"]
+    print(f" saved: {(1 - fused['elapsed'] / chain['elapsed']) * 100:.0f}% wall time, "
+          f"{(1 - fused['bytes_written'] / chain['bytes_written']) * 100:.0f}% bytes written")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup cost of the interactive CLI: importing main and checking for FFmpeg, in fresh
+interpreters, compared with a bare `python -c pass`. Fails (exit status 1) when the
+median overhead exceeds the budget or yt-dlp gets imported before it is needed:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --budget-ms 300 --importtime
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# What the CLI does before showing its prompt, plus the lazy-import check
+STARTUP = (
+    "import sys, main\n"
+    "main.check_ffmpeg()\n"
+    "sys.exit(3 if 'yt_dlp' in sys.modules else 0)\n"
+)
+
+def time_run(code: str, env: dict) -> float:
+    """Wall time of a fresh interpreter running `code`, in seconds"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode == 3:
+        sys.exit("FAIL: yt_dlp was imported at startup, it must only be imported on first use")
+    if result.returncode != 0:
+        sys.exit(f"FAIL: startup exited with status {result.returncode}\n{result.stderr}")
+    return elapsed
+
+def slowest_imports(env: dict, count: int) -> list:
+    """(cumulative microseconds, module) of the slowest modules main imports directly, from -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=SRC_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        # Two spaces of indentation per nesting level below the interpreter's own imports
+        if len(name) - len(name.lstrip()) == 3:
+            imports.append((int(parts[1]), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=300.0,
+                        help="Allowed median startup time on top of the bare interpreter")
+    parser.add_argument("--importtime", action="store_true", help="List the slowest imports")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A private FFmpeg probe cache, warmed by the first run like a user's second start
+        env = dict(os.environ, XDG_CACHE_HOME=cache_dir, LOCALAPPDATA=cache_dir)
+        time_run(STARTUP, env)
+        baseline = [time_run("pass", env) for _ in range(args.runs)]
+        startup = [time_run(STARTUP, env) for _ in range(args.runs)]
+        imports = slowest_imports(env, 10) if args.importtime else []
+
+    base_ms = statistics.median(baseline) * 1000
+    startup_ms = statistics.median(startup) * 1000
+    overhead_ms = startup_ms - base_ms
+    print(f"bare interpreter: {base_ms:7.1f} ms median")
+    print(f"CLI startup:      {startup_ms:7.1f} ms median, {max(startup) * 1000:.1f} ms max ({args.runs} runs)")
+    print(f"overhead:         {overhead_ms:7.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if imports:
+        print("slowest imports:")
+        for micros, name in imports:
+            print(f"  {micros / 1000:7.1f} ms  {name}")
+
+    if overhead_ms > args.budget_ms:
+        sys.exit(f"FAIL: startup overhead {overhead_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    print("OK")
+
+if __name__ == "__main__":
+    main()
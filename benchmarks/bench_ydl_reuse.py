@@ -0,0 +1,65 @@
+"""
+Compare per-item overhead of a fresh YoutubeDL per item against the shared YDLPool.
+
+Runs fully offline against a local HTTP server serving short synthetic clips:
+    python benchmarks/bench_ydl_reuse.py --items 200 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import yt_dlp
+from ydl_pool import YDLPool
+from media_server import MediaServer
+
+def run_fresh(urls, opts, workers):
+    def fetch(url):
+        with yt_dlp.YoutubeDL(dict(opts)) as ydl:
+            ydl.extract_info(url, download=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, urls))
+
+def run_pooled(urls, opts, workers):
+    pool = YDLPool()
+    def fetch(url):
+        with pool.acquire(opts) as ydl:
+            ydl.extract_info(url, download=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, urls))
+    pool.close()
+    return pool
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200, help="Number of clips in the fake playlist")
+    parser.add_argument("--size", type=int, default=32 * 1024, help="Clip size in bytes")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent download workers")
+    args = parser.parse_args()
+
+    with MediaServer() as server, tempfile.TemporaryDirectory() as out_dir:
+        urls = server.add_clips(args.items, args.size)
+        results = {}
+        for name, runner in (("fresh", run_fresh), ("pooled", run_pooled)):
+            opts = {
+                'quiet': True,
+                'no_warnings': True,
+                'noprogress': True,
+                'outtmpl': os.path.join(out_dir, name, '%(title)s.%(ext)s'),
+            }
+            start = time.perf_counter()
+            runner(urls, opts, args.workers)
+            results[name] = time.perf_counter() - start
+
+    for name, elapsed in results.items():
+        per_item = elapsed / args.items * 1000
+        print(f"{name:>7}: {elapsed:7.2f}s total, {per_item:7.2f} ms/item, {args.items / elapsed:7.1f} items/s")
+    saved = (results["fresh"] - results["pooled"]) / args.items * 1000
+    print(f"  saved: {saved:7.2f} ms/item ({results['fresh'] / results['pooled']:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Local HTTP server serving synthetic media files for offline benchmarks"""
+import http.server
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+class _MediaHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler with single byte-range support and optional per-connection throttling"""
+
+    # Set on the subclass created per server
+    throttle: Optional[int] = None
+    fail_from: Optional[int] = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self._range = None
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+        if start >= size or start > end:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self._range = (start, end)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Last-Modified", self.date_time_string(int(os.path.getmtime(path))))
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = self._range[1] - self._range[0] + 1 if self._range else None
+        # Simulate a dropped connection half way through ranges past the failure offset
+        drop_at = remaining // 2 if (
+            remaining and self.fail_from is not None and self._range[0] >= self.fail_from) else None
+        sent = 0
+        while remaining is None or remaining > 0:
+            chunk = source.read(min(64 * 1024, remaining) if remaining is not None else 64 * 1024)
+            if not chunk:
+                break
+            if drop_at is not None and sent + len(chunk) > drop_at:
+                outputfile.write(chunk[:drop_at - sent])
+                return
+            outputfile.write(chunk)
+            sent += len(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+            if self.throttle:
+                time.sleep(len(chunk) / self.throttle)
+
+class MediaServer:
+    """
+    Serve files from a temporary directory on 127.0.0.1 in a background thread.
+    `throttle` caps each connection to that many bytes per second, which is how
+    media CDNs usually limit a single stream.
+    """
+
+    def __init__(self, throttle: Optional[int] = None):
+        self.root = tempfile.mkdtemp(prefix="tube-bench-")
+        handler = type("MediaHandler", (_MediaHandler,), {'throttle': throttle})
+        self.handler = handler
+        self._server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            lambda *args, **kwargs: handler(*args, directory=self.root, **kwargs)
+        )
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def set_fail_from(self, offset: Optional[int]):
+        """Drop range responses starting at or after `offset` part way through (None to stop failing)"""
+        self.handler.fail_from = offset
+
+    def add_clip(self, name: str, size: int) -> str:
+        """Write a synthetic MP3-looking clip of `size` bytes and return its URL"""
+        with open(os.path.join(self.root, name), "wb") as f:
+            f.write(b"\xff\xfb\x90\x00")
+            remaining = max(0, size - 4)
+            # In blocks, so large files don't inflate the memory figures being measured
+            while remaining:
+                block = min(remaining, 1024 * 1024)
+                f.write(os.urandom(block))
+                remaining -= block
+        return f"{self.base_url}/{name}"
+
+    def add_clips(self, count: int, size: int) -> List[str]:
+        return [self.add_clip(f"clip_{index:05d}.mp3", size) for index in range(count)]
+
+    def add_tone(self, name: str, seconds: float) -> str:
+        """Encode a real AAC sine tone with FFmpeg, for runs that transcode what they download"""
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+             '-c:a', 'aac', '-b:a', '128k', '-f', 'mp4', os.path.join(self.root, name)],
+            check=True
+        )
+        return f"{self.base_url}/{name}"
+
+    def add_link(self, name: str, source: str) -> str:
+        """Serve an existing file under another name without copying it"""
+        os.link(os.path.join(self.root, source), os.path.join(self.root, name))
+        return f"{self.base_url}/{name}"
@@ -0,0 +1,122 @@
+"""
+Stand-in extractor answering YouTube watch and playlist URLs from a local catalog.
+
+Metadata is deterministic and every format points at a file on a MediaServer,
+so the real resolve/download/post-process code paths run without network access.
+"""
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+@dataclass
+class StubItem:
+    id: str
+    title: str
+    duration: int
+    url: str
+    size: int
+
+class StubCatalog:
+    """Videos and a single playlist served by StubIE"""
+
+    def __init__(self, playlist_id: str = "PLbenchmark", title: str = "Benchmark Playlist"):
+        self.playlist_id = playlist_id
+        self.title = title
+        self.items: Dict[str, StubItem] = {}
+        # Video extractions served, i.e. extractor round-trips a real site would have seen
+        self.extractions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def video_id(index: int) -> str:
+        """Eleven characters, like a real video ID"""
+        return f"bench{index:06d}"
+
+    def add(self, index: int, url: str, size: int) -> StubItem:
+        item = StubItem(
+            id=self.video_id(index),
+            title=f"Benchmark Track {index:06d}",
+            duration=180 + index % 120,
+            url=url,
+            size=size
+        )
+        self.items[item.id] = item
+        return item
+
+    def video_url(self, item: StubItem) -> str:
+        return f"https://www.youtube.com/watch?v={item.id}"
+
+    @property
+    def playlist_url(self) -> str:
+        return f"https://www.youtube.com/playlist?list={self.playlist_id}"
+
+    def info(self, video_id: str) -> dict:
+        """Full info dict with an audio-only and a combined format, both backed by the same file"""
+        item = self.items[video_id]
+        return {
+            'id': item.id,
+            'title': item.title,
+            'duration': item.duration,
+            'categories': ['Music'],
+            'tags': ['benchmark'],
+            'description': '',
+            'formats': [
+                {
+                    'format_id': '140',
+                    'url': item.url,
+                    'ext': 'm4a',
+                    'acodec': 'mp4a.40.2',
+                    'vcodec': 'none',
+                    'abr': 128,
+                    'filesize': item.size,
+                },
+                {
+                    'format_id': '18',
+                    'url': item.url,
+                    'ext': 'mp4',
+                    'acodec': 'mp4a.40.2',
+                    'vcodec': 'avc1.42001E',
+                    'height': 360,
+                    'filesize': item.size,
+                },
+            ],
+        }
+
+def stub_extractor(catalog: StubCatalog) -> InfoExtractor:
+    """Build an extractor instance bound to `catalog`"""
+
+    class StubIE(InfoExtractor):
+        IE_NAME = 'stub'
+        _VALID_URL = r'https?://(?:www\.)?youtube\.com/(?:watch\?v=(?P<id>[\w-]+)|playlist\?list=(?P<list>[\w-]+))'
+
+        def _real_extract(self, url):
+            video_id, list_id = self._match_valid_url(url).group('id', 'list')
+            if list_id:
+                # Lazy, like the pages of a real channel listing
+                entries = (
+                    self.url_result(catalog.video_url(item), self.ie_key(), item.id, item.title, duration=item.duration)
+                    for item in list(catalog.items.values())
+                )
+                return self.playlist_result(entries, list_id, catalog.title)
+            with catalog._lock:
+                catalog.extractions += 1
+            return catalog.info(video_id)
+
+    return StubIE()
+
+def stub_factory(catalog: StubCatalog) -> Callable[[dict], yt_dlp.YoutubeDL]:
+    """YDLPool factory whose instances only know the stub extractor"""
+
+    def factory(opts: dict) -> yt_dlp.YoutubeDL:
+        ydl = yt_dlp.YoutubeDL(opts, auto_init=False)
+        ydl.add_info_extractor(stub_extractor(catalog))
+        return ydl
+
+    return factory
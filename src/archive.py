@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+STATUS_NEW = "new"
+STATUS_CHANGED = "changed"
+STATUS_DONE = "done"
+
+# Audio policies: always transcode to MP3, or keep AAC/Opus/MP3 source streams as they are
+AUDIO_MP3 = "mp3"
+AUDIO_COPY = "copy"
+AUDIO_POLICIES = (AUDIO_MP3, AUDIO_COPY)
+
+def media_format(download_video: bool, convert_to_audio: bool, audio_policy: str = AUDIO_MP3) -> str:
+    """Name the kind of file a download produces, matching _get_ydl_opts"""
+    if download_video and not convert_to_audio:
+        return "video"
+    # Stream-copied files are a different container, never interchangeable with the MP3s
+    return "audio" if audio_policy == AUDIO_MP3 else f"audio-{audio_policy}"
+
+class DownloadArchive:
+    """
+    Append-only JSON lines record of completed downloads for an output directory.
+    Entries are keyed by (video ID, format, playlist) and remember the bitrate
+    and final output path so re-runs can skip work that is already on disk.
+    A second index by (video ID, format, bitrate) finds identical files in other folders.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[Tuple[str, str, str], dict] = {}
+        self._content: Dict[Tuple[str, str, Optional[str]], Set[Tuple[str, str, str]]] = {}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        lines = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Ignore a torn line from an interrupted write
+                        continue
+                    self._store(record)
+                    lines += 1
+
+        # Superseded records only accumulate on re-downloads, rewrite once they dominate
+        if lines > 2 * len(self._records) + 100:
+            self._compact()
+
+    @staticmethod
+    def _key(video_id: str, fmt: str, playlist_name: Optional[str]) -> Tuple[str, str, str]:
+        return video_id, fmt, playlist_name or ""
+
+    @staticmethod
+    def _bitrate(fmt: str, bitrate: Optional[str]) -> Optional[str]:
+        # Stream-copy still transcodes sources it can't keep, so every audio format depends on it
+        return None if fmt == "video" else bitrate
+
+    @classmethod
+    def _content_key(cls, video_id: str, fmt: str, bitrate: Optional[str]) -> Tuple[str, str, Optional[str]]:
+        return video_id, fmt, cls._bitrate(fmt, bitrate)
+
+    def _store(self, record: dict):
+        """Add or replace a record in both indexes"""
+        key = self._key(record['id'], record['format'], record.get('playlist'))
+        previous = self._records.get(key)
+        if previous is not None:
+            self._content.get(
+                self._content_key(previous['id'], previous['format'], previous.get('bitrate')), set()
+            ).discard(key)
+        self._records[key] = record
+        self._content.setdefault(self._content_key(record['id'], record['format'], record.get('bitrate')), set()).add(key)
+
+    def _compact(self):
+        """Rewrite the archive keeping only the latest record per key"""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for record in self._records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(temp_path, self.path)
+
+    def get(self, video_id: str, fmt: str, playlist_name: Optional[str] = None) -> Optional[dict]:
+        """Return the archive record for an item, if any"""
+        return self._records.get(self._key(video_id, fmt, playlist_name))
+
+    def status(self, video_id: str, fmt: str, bitrate: str, playlist_name: Optional[str] = None) -> str:
+        """
+        Classify an item against the archive
+        Returns: 'new', 'changed' (settings differ or file is gone) or 'done'
+        """
+        record = self.get(video_id, fmt, playlist_name)
+        if record is None:
+            return STATUS_NEW
+        if record.get('bitrate') != self._bitrate(fmt, bitrate):
+            return STATUS_CHANGED
+        if not record.get('path') or not os.path.exists(record['path']):
+            return STATUS_CHANGED
+        return STATUS_DONE
+
+    def find_copy(self, video_id: str, fmt: str, bitrate: str) -> Optional[str]:
+        """Path of an existing file for this video, format and bitrate anywhere in the output directory"""
+        with self._lock:
+            keys = list(self._content.get(self._content_key(video_id, fmt, bitrate), ()))
+            paths = [self._records[key].get('path') for key in keys]
+        for path in paths:
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def record(self, video_id: str, fmt: str, bitrate: str, path: str, playlist_name: Optional[str] = None):
+        """Mark an item as completed"""
+        record = {
+            'id': video_id,
+            'format': fmt,
+            'bitrate': self._bitrate(fmt, bitrate),
+            'playlist': playlist_name,
+            'path': path,
+            'completed_at': time.time()
+        }
+        with self._lock:
+            self._store(record)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
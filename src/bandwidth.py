@@ -0,0 +1,103 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# yt-dlp's default --buffer-size, the most its first read of a file can return
+FIRST_BLOCK_BYTES = 1024
+
+def fetched_before_first_report(status: dict) -> int:
+    """
+    Bytes this run fetched before a file's first progress report. A resumed .part file
+    is included in downloaded_bytes, but yt-dlp's speed only covers this run's bytes,
+    so speed times elapsed bounds the fresh part. yt-dlp leaves the speed out when the
+    first read took under a millisecond, which makes it that single block. A file found
+    complete is charged nothing rather than a whole resumed file
+    """
+    if status.get('status') != 'downloading':
+        return 0
+    downloaded = status.get('downloaded_bytes') or 0
+    speed, elapsed = status.get('speed'), status.get('elapsed')
+    if not speed or not elapsed:
+        return min(downloaded, FIRST_BLOCK_BYTES)
+    return min(downloaded, int(speed * elapsed))
+
+class BandwidthLimiter:
+    """
+    Token bucket capping the combined download rate of every worker that shares it.
+    The rate (bytes per second, None for unlimited) can be changed while downloads run.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst_seconds: float = 1.0):
+        self.burst_seconds = burst_seconds
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._rate: Optional[float] = None
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self._started: Optional[float] = None
+        self.set_rate(rate)
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self._rate
+
+    def set_rate(self, rate: Optional[float]):
+        """Change the allowed rate, takes effect for the next block any worker reads"""
+        with self._lock:
+            self._rate = rate if rate and rate > 0 else None
+            self._tokens = min(self._tokens, self._burst())
+            self._last = time.monotonic()
+
+    def _burst(self) -> float:
+        return (self._rate or 0) * self.burst_seconds
+
+    def consume(self, nbytes: int):
+        """Account for `nbytes` just received, sleeping if the shared budget is exhausted"""
+        if nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now
+            self.total_bytes += nbytes
+            if self._rate is None:
+                return
+            self._tokens = min(self._burst(), self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            # Going into debt lets each caller proceed in arrival order without a wait queue
+            self._tokens -= nbytes
+            delay = -self._tokens / self._rate if self._tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+    def progress_hook(self) -> Callable[[dict], None]:
+        """Build a yt-dlp progress hook that feeds one download's bytes into the bucket"""
+        seen: Dict[str, int] = {}
+
+        def hook(status: dict):
+            if status.get('status') not in ('downloading', 'finished'):
+                return
+            filename = status.get('tmpfilename') or status.get('filename') or ''
+            downloaded = status.get('downloaded_bytes') or 0
+            if filename in seen:
+                previous = seen[filename]
+            else:
+                previous = downloaded - fetched_before_first_report(status)
+            seen[filename] = downloaded
+            self.consume(downloaded - previous)
+
+        return hook
+
+    def snapshot(self) -> dict:
+        """Totals used to report achieved versus allowed throughput over an interval"""
+        with self._lock:
+            return {'bytes': self.total_bytes, 'time': time.monotonic(), 'rate': self._rate}
+
+    @staticmethod
+    def achieved(start: dict, end: dict) -> float:
+        """Average bytes per second between two snapshots"""
+        elapsed = end['time'] - start['time']
+        return (end['bytes'] - start['bytes']) / elapsed if elapsed > 0 else 0.0
+
+# Shared by every downloader in the process so the cap applies to the total
+shared_limiter = BandwidthLimiter()
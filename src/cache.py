@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional
+from media import Media
+
+DEFAULT_TTL = 7 * 24 * 60 * 60  # One week
+DEFAULT_MAX_ENTRIES = 20000
+
+@dataclass
+class CacheEntry:
+    media: Media
+    formats: List[dict]
+    is_music: bool
+
+class MetadataCache:
+    """
+    Persistent SQLite cache of resolved video metadata keyed by video ID.
+    Entries expire after `ttl` seconds and the least recently used entries
+    are evicted once the cache grows past `max_entries`.
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS media (
+                id TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                formats BLOB,
+                is_music INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS media_accessed ON media(accessed_at)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def get(self, video_id: str) -> Optional[CacheEntry]:
+        """Return the cached entry for a video ID, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record, formats, is_music, created_at FROM media WHERE id = ?",
+                (video_id,)
+            ).fetchone()
+
+            if row is None or now - row[3] > self.ttl:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE media SET accessed_at = ? WHERE id = ?", (now, video_id))
+            self.hits += 1
+
+        record, formats, is_music, _ = row
+        return CacheEntry(
+            media=Media.from_save_format(record),
+            formats=json.loads(zlib.decompress(formats)) if formats else [],
+            is_music=bool(is_music)
+        )
+
+    def put(self, media: Media, video_info: dict, is_music: bool = False):
+        """Store resolved media and its raw format list"""
+        # Playlist names depend on the caller, only the video itself is cached
+        record = Media(id=media.id, title=media.title, duration=media.duration).to_save_format()
+        formats = [
+            {key: value for key, value in fmt.items() if key != 'fragments'}
+            for fmt in video_info.get('formats') or []
+        ]
+        blob = zlib.compress(json.dumps(formats, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM media WHERE id = ?", (media.id,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media (id, record, formats, is_music, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (media.id, record, blob, int(is_music), now, now)
+            )
+            if not exists:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict(self._count - self.max_entries)
+
+    def _evict(self, count: int):
+        """Remove the `count` least recently used entries (lock must be held)"""
+        self._conn.execute(
+            "DELETE FROM media WHERE id IN (SELECT id FROM media ORDER BY accessed_at LIMIT ?)",
+            (count,)
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def purge_expired(self) -> int:
+        """Delete all expired entries and return how many were removed"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM media WHERE created_at < ?", (time.time() - self.ttl,))
+            self._count -= cursor.rowcount
+            return cursor.rowcount
@@ -0,0 +1,99 @@
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+# yt-dlp reports server throttling as "HTTP Error 429: Too Many Requests" / "HTTP Error 403: Forbidden"
+THROTTLE_RE = re.compile(r'HTTP Error (429|403)')
+
+def is_throttle_error(error: Optional[BaseException]) -> bool:
+    """Whether an exception looks like the server pushing back on request rate"""
+    return error is not None and bool(THROTTLE_RE.search(str(error)))
+
+class AdaptiveConcurrency:
+    """
+    AIMD controller for the number of downloads allowed to run at once.
+
+    Each measurement window the limit grows by one while aggregate throughput
+    keeps up, is halved when the server throttles (HTTP 429/403), and holds
+    while `pressure()` reports that post-processing is the bottleneck.
+    With min_limit == max_limit it behaves as a plain fixed-size semaphore.
+    """
+
+    def __init__(self,
+                 min_limit: int,
+                 max_limit: int,
+                 initial: Optional[int] = None,
+                 window: float = 5.0,
+                 pressure: Optional[Callable[[], bool]] = None):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial or self.min_limit, self.min_limit), self.max_limit)
+        self.window = window
+        self.pressure = pressure
+
+        self.peak_limit = self.limit
+        self.backoffs = 0
+        self._active = 0
+        self._cond = threading.Condition()
+        self._last_throughput: Optional[float] = None
+        self._reset_window(time.monotonic())
+
+    def _reset_window(self, now: float):
+        self._window_start = now
+        self._bytes = 0
+        self._completed = 0
+        self._errors = 0
+        self._throttled = 0
+
+    @property
+    def adaptive(self) -> bool:
+        return self.min_limit < self.max_limit
+
+    def acquire(self):
+        """Block until a download slot is free under the current limit"""
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self, bytes_downloaded: int = 0, error: Optional[BaseException] = None):
+        """Return a slot and feed the outcome of the download into the controller"""
+        with self._cond:
+            self._active -= 1
+            self._bytes += bytes_downloaded
+            self._completed += 1
+            if error is not None:
+                self._errors += 1
+                if is_throttle_error(error):
+                    self._throttled += 1
+            if self.adaptive:
+                self._adjust()
+            self._cond.notify_all()
+
+    def _adjust(self):
+        """Apply one AIMD step once the window has enough samples (lock must be held)"""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        # Throttling is acted on immediately, everything else waits for a full window
+        if not self._throttled and (elapsed < self.window or self._completed < self.limit):
+            return
+
+        throughput = self._bytes / elapsed if elapsed > 0 else 0.0
+        if self._throttled:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self.backoffs += 1
+        elif self._errors * 2 > self._completed:
+            self.limit = max(self.min_limit, self.limit - 1)
+        elif self.pressure and self.pressure():
+            # Converters are saturated, more downloads would only queue up
+            pass
+        elif self._last_throughput is None or throughput >= self._last_throughput * 0.95:
+            self.limit = min(self.max_limit, self.limit + 1)
+        else:
+            # The last increase stopped paying off
+            self.limit = max(self.min_limit, self.limit - 1)
+
+        self.peak_limit = max(self.peak_limit, self.limit)
+        self._last_throughput = throughput
+        self._reset_window(now)
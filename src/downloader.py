@@ -1,42 +1,167 @@
 from concurrent.futures import ThreadPoolExecutor
+import glob
 import os
+import queue
+import threading
+import time
 from datetime import datetime
-import yt_dlp
-from typing import List, Optional
-from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
-import glob
+from rich.progress import (
+    Progress, SpinnerColumn, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn, TimeRemainingColumn
+)
+import re
+from functools import lru_cache
+from media import Media
+from archive import DownloadArchive, media_format, STATUS_DONE, STATUS_CHANGED, AUDIO_MP3, AUDIO_COPY
+from ydl_pool import YDLPool, shared_pool
+from concurrency import AdaptiveConcurrency
+from bandwidth import BandwidthLimiter, fetched_before_first_report, shared_limiter
+from retry_queue import RetryQueue, classify_error
+from metrics import (
+    DOWNLOAD_BYTES, DOWNLOADS, DEDUPLICATED, AUDIO_OUTPUTS, DOWNLOAD_INFO, DOWNLOAD_ABORTS, FAILURES,
+    DOWNLOAD_SECONDS, POSTPROCESS_SECONDS
+)
+from fileops import link_or_copy
+from tracing import tracer
+from watchdog import ItemWatch, ABORT_CANCELLED, DEFAULT_STALL_TIMEOUT
+from scheduling import ORDER_PLAYLIST, ORDER_LONGEST, ORDER_LABELS, order_media, simulate_makespan
+
+if TYPE_CHECKING:
+    from job_queue import JobQueue
 
 console = Console()
 
+# Source audio containers that are removed once converted
+WEB_AUDIO_EXTENSIONS = {'.m4a', '.webm', '.ogg', '.opus', '.weba', '.wav'}
+# yt-dlp names the separate streams of a merged format `<title>.f<format_id>.<ext>`
+FORMAT_PART_RE = re.compile(r'\.f\d+\.[^.]+$', re.IGNORECASE)
+# Source codecs kept as-is by the copy audio policy, and the container they end up in
+STREAM_COPY_CODECS = {'aac': 'm4a', 'mp3': 'mp3'}
+AUDIO_STREAM_COPIED = "stream_copy"
+AUDIO_TRANSCODED = "transcode"
+# Signed stream URLs carry their expiry time, as a query parameter or a manifest path segment
+URL_EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+# A stored info dict is only reused when its URLs stay valid at least this long (seconds)
+STORED_INFO_MARGIN = 300
+INFO_REUSED = "reused"
+INFO_EXTRACTED = "extracted"
+# yt-dlp's own timeout for a socket read that receives nothing and its retries, stall detection may lower both
+YTDLP_SOCKET_TIMEOUT = 20
+YTDLP_RETRIES = 10
+
+@lru_cache(maxsize=None)
+def _stream_copy_codecs() -> dict:
+    """
+    STREAM_COPY_CODECS plus Opus when mutagen is installed, without it cover art can't be
+    embedded in Opus files and Opus is transcoded like anything else
+    """
+    # yt-dlp is only imported once there is work for it, it dominates startup time otherwise
+    from yt_dlp.dependencies import mutagen
+    return dict(STREAM_COPY_CODECS, opus='opus') if mutagen else STREAM_COPY_CODECS
+
+def _source_codec(info: dict) -> str:
+    """Audio codec of a downloaded format, e.g. 'mp4a.40.2' -> 'aac'"""
+    codec = (info.get('acodec') or '').split('.')[0].lower()
+    return 'aac' if codec == 'mp4a' else codec
+
+def _info_expired(info: dict, margin: float = STORED_INFO_MARGIN) -> bool:
+    """Whether a stream URL of a resolved info dict expires within `margin` seconds"""
+    deadline = time.time() + margin
+    for fmt in info.get('formats') or [info]:
+        match = URL_EXPIRE_RE.search(fmt.get('url') or fmt.get('manifest_url') or '')
+        if match and int(match.group(1)) < deadline:
+            return True
+    return False
+
+def _sibling_files(path: str) -> Set[str]:
+    """Files sharing the name of `path` before the extension: the outputs of converting it"""
+    return set(glob.glob(glob.escape(os.path.splitext(path)[0]) + '.*'))
+
+def _progress_columns() -> tuple:
+    """Progress bar layout showing bytes, speed and ETA for each download"""
+    return (
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn()
+    )
+
 @dataclass
-class Media:
-    id: str
-    title: str
-    duration: str
-    is_from_metadata: bool = False
-    playlist_name: Optional[str] = None
-
-    def to_save_format(self) -> str:
-        return f"{self.id}###{self.duration}###{self.title}###{self.title}"
-
-    @classmethod
-    def from_save_format(cls, line: str) -> 'Media':
-        data = line.strip().split("###")
-        return cls(
-            id=data[0],
-            duration=data[1],
-            title=data[3],
-            is_from_metadata=False
-        )
+class DownloadJob:
+    """State carried from the download stage to the post-processing stage"""
+    media: Media
+    opts: dict
+    is_playlist: bool
+    download_video: bool
+    keep_video: bool
+    convert_to_audio: bool
+    bitrate: str
+    audio_policy: str = AUDIO_MP3
+    task_id: Optional[int] = None
+    info: Optional[dict] = None
+    # Every file written for this job, so cleanup never touches other downloads
+    files: Set[str] = field(default_factory=set)
+    error: Optional[Exception] = None
+    # How the audio file was produced, stream copied or transcoded
+    audio_output: Optional[str] = None
+    # Timeout, stall and cancellation checks of the current download attempt
+    watch: Optional[ItemWatch] = None
+    # Kept across attempts, so a resumed download doesn't count its earlier bytes again
+    byte_hook: Optional[Callable[[dict], None]] = None
+
+    @property
+    def format(self) -> str:
+        return media_format(self.download_video, self.convert_to_audio, self.audio_policy)
 
 class YouTubeDownloader:
     
-    def __init__(self, output_dir: str = "output", max_workers: int = 4):
+    def __init__(self,
+                 output_dir: str = "output",
+                 max_workers: int = 4,
+                 min_workers: Optional[int] = None,
+                 postprocess_workers: Optional[int] = None,
+                 use_archive: bool = True,
+                 pool: YDLPool = shared_pool,
+                 segment_connections: int = 1,
+                 segment_size: Optional[int] = None,
+                 bandwidth: BandwidthLimiter = shared_limiter,
+                 item_rate_limit: Optional[float] = None,
+                 fused_postprocess: bool = True,
+                 item_timeout: Optional[float] = None,
+                 stall_timeout: Optional[float] = DEFAULT_STALL_TIMEOUT,
+                 max_requeues: int = 2,
+                 live_progress: bool = True):
         self.output_dir = output_dir
         self.max_workers = max_workers
+        # Below max_workers, playlist downloads adapt their concurrency between the two bounds
+        self.min_workers = min(min_workers or max_workers, max_workers)
+        self.pool = pool
+        # More than one connection fetches each file as parallel byte ranges
+        self.segment_connections = segment_connections
+        # None for segmented.DEFAULT_SEGMENT_SIZE, the module is only imported once a segmented download runs
+        self.segment_size = segment_size
+        # Total rate across all workers, plus an optional cap per item (bytes/s)
+        self.bandwidth = bandwidth
+        self.item_rate_limit = item_rate_limit
+        # Convert, tag and embed cover art in one FFmpeg run instead of yt-dlp's three-step chain
+        self.fused_postprocess = fused_postprocess
+        # Downloads running longer than item_timeout or stalled for stall_timeout seconds are stopped
+        # and, in playlists, wait for a slot again up to max_requeues times, resuming their partial file
+        self.item_timeout = item_timeout
+        self.stall_timeout = stall_timeout
+        self.max_requeues = max_requeues
+        # Rich allows one live display per process, headless callers running several jobs at once turn it off
+        self.live_progress = live_progress
+        # Transcoding is CPU bound, size it to the machine rather than the link
+        self.postprocess_workers = postprocess_workers or os.cpu_count() or 1
+        self.state_dir = os.path.join(output_dir, ".state")
         self._ensure_directories()
+        self.archive = DownloadArchive(os.path.join(self.state_dir, "archive.jsonl")) if use_archive else None
+        self.retry_queue = RetryQueue(os.path.join(self.state_dir, "retry.sqlite3"))
 
     def _ensure_directories(self):
         """Create necessary directories if they don't exist"""
@@ -44,6 +169,7 @@ class YouTubeDownloader:
         os.makedirs(os.path.join(self.output_dir, "playlist"), exist_ok=True)
         os.makedirs(os.path.join(self.output_dir, "video"), exist_ok=True)
         os.makedirs(os.path.join(self.output_dir, "audio"), exist_ok=True)
+        os.makedirs(self.state_dir, exist_ok=True)
 
     def _get_output_path(self, media: Media, is_playlist: bool, is_audio_output: bool) -> str:
         """Generate appropriate output path based on media type and context"""
@@ -58,40 +184,58 @@ class YouTubeDownloader:
             # For single files, use direct media type directory
             return os.path.join(self.output_dir, media_type)
 
-    def _clean_temp_files(self, output_path: str, base_filename: str):
-        """Clean up temporary and duplicate video files"""
-        # Remove temporary .part files
-        for part_file in glob.glob(os.path.join(output_path, "*.part")):
-            try:
-                os.remove(part_file)
-            except Exception:
-                pass
+    def _link_existing(self, media: Media, is_playlist: bool, fmt: str, bitrate: str) -> bool:
+        """Reuse an identical file from another folder of the output directory instead of downloading it again"""
+        if not self.archive:
+            return False
+        source = self.archive.find_copy(media.id, fmt, bitrate)
+        if not source:
+            return False
 
-        # Remove duplicate video files with codes
-        pattern = os.path.join(output_path, f"{base_filename}.*[.][fF][0-9]*.*")
-        for dup_file in glob.glob(pattern):
-            try:
-                os.remove(dup_file)
-            except Exception:
-                pass
-                
-        # Clean up web audio formats
-        web_audio_patterns = [
-            "*.m4a",
-            "*.webm",
-            "*.ogg",
-            "*.opus",
-            "*.weba",
-            "*.wav"
-        ]
-        
-        for pattern in web_audio_patterns:
-            for audio_file in glob.glob(os.path.join(output_path, pattern)):
+        target = os.path.join(
+            self._get_output_path(media, is_playlist, fmt != "video"),
+            os.path.basename(source)
+        )
+        try:
+            with tracer.span("link_existing", "dedupe", video_id=media.id):
+                method = link_or_copy(source, target) if os.path.abspath(source) != os.path.abspath(target) else "existing"
+        except OSError as e:
+            console.print(f"[yellow]Warning: Could not reuse {source}, downloading instead: {str(e)}")
+            return False
+
+        self.archive.record(media.id, fmt, bitrate, target, media.playlist_name if is_playlist else None)
+        self.retry_queue.remove(media, fmt)
+        DEDUPLICATED.inc(method=method)
+        console.print(f"[green]Reused existing copy ({method}): {media.title}")
+        return True
+
+    def _register_files(self, job: 'DownloadJob', info: dict):
+        """Record every file yt-dlp reports having written for this job"""
+        for fmt in info.get('requested_formats') or []:
+            if fmt.get('filepath'):
+                job.files.add(fmt['filepath'])
+        job.files.update(info.get('__files_to_merge') or [])
+        for thumbnail in info.get('thumbnails') or []:
+            if thumbnail.get('filepath'):
+                job.files.add(thumbnail['filepath'])
+        if info.get('filepath'):
+            job.files.add(info['filepath'])
+
+    def _clean_temp_files(self, job: 'DownloadJob'):
+        """Remove the intermediate files this job produced, leaving other workers' files alone"""
+        final_path = job.info.get('filepath') if job.info else None
+        # .part files are left in place so interrupted downloads can resume
+        for path in job.files:
+            if path == final_path:
+                continue
+            name = os.path.basename(path)
+            # Per-format parts of merged videos and source audio that was converted
+            if FORMAT_PART_RE.search(name) or os.path.splitext(name)[1].lower() in WEB_AUDIO_EXTENSIONS:
                 try:
-                    os.remove(audio_file)
-                except Exception:
+                    os.remove(path)
+                except OSError:
                     pass
-    
+
     def _get_ydl_opts(self, 
                      media: Media, 
                      is_playlist: bool,
@@ -113,9 +257,16 @@ class YouTubeDownloader:
             'keepvideo': keep_video,
             'quiet': True,
             'no_warnings': True,
+            # Progress is drawn from our own hooks, yt-dlp's status line would garble it
+            'noprogress': True,
             'writethumbnail': True,
             'postprocessors': []
         }
+        if self.item_rate_limit:
+            opts['ratelimit'] = self.item_rate_limit
+        if self.stall_timeout:
+            opts['socket_timeout'], retries = self._stall_limits(YTDLP_SOCKET_TIMEOUT, YTDLP_RETRIES)
+            opts['retries'] = opts['fragment_retries'] = retries
 
         # Add audio conversion if needed
         if is_audio_output:
@@ -147,6 +298,379 @@ class YouTubeDownloader:
             
         return opts
 
+    def _prepare_job(self,
+                     media: Media,
+                     progress: Optional[Progress],
+                     is_playlist: bool,
+                     download_video: bool,
+                     keep_video: bool,
+                     convert_to_audio: bool,
+                     bitrate: str,
+                     audio_policy: str = AUDIO_MP3) -> 'DownloadJob':
+        """Build the job state shared by the download and post-processing stages"""
+        task_id = progress.add_task(f"[cyan]Downloading {media.title}...", total=None) if progress else None
+        opts = self._get_ydl_opts(
+            media,
+            is_playlist,
+            download_video,
+            keep_video,
+            convert_to_audio,
+            bitrate
+        )
+        return DownloadJob(
+            media=media,
+            opts=opts,
+            is_playlist=is_playlist,
+            download_video=download_video,
+            keep_video=keep_video,
+            convert_to_audio=convert_to_audio,
+            bitrate=bitrate,
+            audio_policy=audio_policy,
+            task_id=task_id
+        )
+
+    def _byte_progress_hook(self,
+                            job: 'DownloadJob',
+                            progress: Optional[Progress] = None,
+                            on_bytes: Optional[Callable[[int, int], None]] = None) -> Callable[[dict], None]:
+        """
+        Build a progress hook that drives the job's progress bar and the byte metrics
+        `on_bytes(downloaded, total)` receives the changes, for aggregate progress.
+        The hook also stops the download once the job's watch reports a timeout, stall or cancel
+        """
+        from yt_dlp.utils import DownloadCancelled
+        # Per file: [bytes on disk, expected size], merged formats report one file each
+        files: Dict[str, List[int]] = {}
+        seen: Dict[str, int] = {}
+        lock = threading.Lock()
+
+        def hook(status: dict):
+            if status.get('status') not in ('downloading', 'finished'):
+                return
+            filename = status.get('filename') or status.get('tmpfilename') or ''
+            downloaded = status.get('downloaded_bytes')
+            total = status.get('total_bytes') or status.get('total_bytes_estimate')
+
+            with lock:
+                entry = files.setdefault(filename, [0, 0])
+                total_change = 0
+                if total:
+                    total_change = int(total) - entry[1]
+                    entry[1] = int(total)
+                if downloaded is not None:
+                    # Charged like the bandwidth limiter, without the bytes a resumed file had on disk
+                    if filename in seen:
+                        previous = seen[filename]
+                    else:
+                        previous = downloaded - fetched_before_first_report(status)
+                    seen[filename] = downloaded
+                    DOWNLOAD_BYTES.inc(max(0, downloaded - previous))
+                # Files found complete on disk finish without a byte count
+                shown = downloaded if downloaded is not None else entry[1]
+                done_change = shown - entry[0]
+                entry[0] = shown
+                task_completed = sum(done for done, _ in files.values())
+                task_total = sum(size for _, size in files.values()) or None
+
+            if progress and job.task_id is not None:
+                progress.update(job.task_id, completed=task_completed, total=task_total)
+            if on_bytes and (done_change or total_change):
+                on_bytes(done_change, total_change)
+            if job.watch and job.watch.check(task_completed):
+                # Passed through yt-dlp untouched, the .part file stays for the next attempt
+                raise DownloadCancelled(f"Download {job.watch.describe()}")
+
+        return hook
+
+    def _postprocessor_hook(self, job: 'DownloadJob', progress: Optional[Progress] = None) -> Callable[[dict], None]:
+        """Build a post-processor hook that times each step and shows it on the job's progress bar"""
+        started: Dict[str, float] = {}
+
+        def hook(status: dict):
+            name = status.get('postprocessor') or 'unknown'
+            if status.get('status') == 'started':
+                started[name] = time.perf_counter()
+                if progress and job.task_id is not None:
+                    progress.update(job.task_id, description=f"[magenta]Converting {job.media.title} ({name})...")
+            elif status.get('status') == 'finished' and name in started:
+                start, end = started.pop(name), time.perf_counter()
+                POSTPROCESS_SECONDS.observe(end - start, postprocessor=name)
+                tracer.record(name, start, end, "postprocess", video_id=job.media.id)
+
+        return hook
+
+    def _fetch(self,
+               job: 'DownloadJob',
+               progress: Optional[Progress] = None,
+               on_bytes: Optional[Callable[[int, int], None]] = None) -> bool:
+        """Network stage: download the media without running the post-processing chain"""
+        from yt_dlp.utils import DownloadError
+        try:
+            start = time.perf_counter()
+            fetch_opts = dict(job.opts, postprocessors=[])
+            if job.byte_hook is None:
+                job.byte_hook = self._byte_progress_hook(job, progress, on_bytes)
+            byte_hook = job.byte_hook
+            # Only needed once, and it can be large
+            stored, job.media.info = job.media.info, None
+            with self.pool.acquire(fetch_opts, progress_hooks=[self.bandwidth.progress_hook(), byte_hook]) as ydl, \
+                    tracer.span("download", "network", video_id=job.media.id):
+                info = None
+                if stored and not _info_expired(stored):
+                    try:
+                        # Format selection runs again under the download options, no extractor request
+                        info = self._download(ydl, ydl.process_ie_result, stored, byte_hook)
+                        DOWNLOAD_INFO.inc(source=INFO_REUSED)
+                    except (DownloadError, OSError) as e:
+                        # A silent connection isn't fixed by fresh URLs and would wait out its timeouts twice
+                        if 'timed out' in str(e).lower():
+                            raise
+                        # Most likely the stream URLs were revoked early, fresh ones need a new extraction
+                        console.print(f"[yellow]Stored formats for {job.media.title} failed, extracting again: {e}")
+                        info = None
+                if info is None:
+                    url = f"http://www.youtube.com/watch?v={job.media.id}"
+                    info = self._download(ydl, ydl.extract_info, url, byte_hook)
+                    DOWNLOAD_INFO.inc(source=INFO_EXTRACTED)
+
+            if not info or not info.get('requested_downloads'):
+                raise ValueError("Nothing was downloaded")
+
+            # yt-dlp strips keys shared with the parent info dict from each requested download
+            job.info = dict(info)
+            job.info.update(info['requested_downloads'][-1])
+            job.info.pop('requested_downloads', None)
+            # Format merging already happened during the download
+            job.info['__postprocessors'] = []
+            self._register_files(job, job.info)
+            DOWNLOAD_SECONDS.observe(time.perf_counter() - start)
+            return True
+
+        except Exception as e:
+            if job.watch and job.watch.reason:
+                # Stopped on purpose, the caller decides between a re-queue and a failure
+                job.error = e
+                DOWNLOAD_ABORTS.inc(reason=job.watch.reason)
+                return False
+            self._fail(job, e, stage='download')
+            return False
+
+    def _download(self, ydl, resolve: Callable, source, progress_hook: Optional[Callable[[dict], None]] = None):
+        """
+        Download through `resolve`, ydl.extract_info for a URL or ydl.process_ie_result
+        for an info dict resolved earlier
+        """
+        if self.segment_connections > 1:
+            # Resolve first so the selected file can be fetched over several connections,
+            # yt-dlp then finds it already on disk and only runs the remaining steps
+            info = resolve(source, download=False)
+            if info:
+                self._segmented_download(ydl, info, progress_hook)
+                info = ydl.process_ie_result(info, download=True)
+            return info
+        return resolve(source, download=True)
+
+    def _segmented_download(self, ydl, info: dict, progress_hook: Optional[Callable[[dict], None]] = None):
+        """Fetch a single-file HTTP format as parallel range requests, if the server allows it"""
+        from segmented import (
+            SegmentedDownload, RangeNotSupported, ProgressHookError, DEFAULT_SEGMENT_SIZE,
+            DEFAULT_TIMEOUT as SEGMENT_TIMEOUT, DEFAULT_RETRIES as SEGMENT_RETRIES
+        )
+        segment_size = self.segment_size or DEFAULT_SEGMENT_SIZE
+        # Merged video+audio formats are left to yt-dlp
+        if info.get('requested_formats') or info.get('protocol') not in ('http', 'https'):
+            return
+        size = info.get('filesize') or info.get('filesize_approx')
+        if size and size <= segment_size:
+            return
+
+        filename = ydl.prepare_filename(info)
+        if os.path.exists(filename):
+            return
+        timeout, retries = self._stall_limits(SEGMENT_TIMEOUT, SEGMENT_RETRIES)
+        try:
+            with tracer.span("segmented_download", "network", video_id=info.get('id')):
+                SegmentedDownload(
+                    info['url'],
+                    filename,
+                    headers=info.get('http_headers'),
+                    connections=self.segment_connections,
+                    segment_size=segment_size,
+                    timeout=timeout,
+                    retries=retries,
+                    progress_hook=progress_hook,
+                    limiters=[self.bandwidth] + ([BandwidthLimiter(self.item_rate_limit)] if self.item_rate_limit else [])
+                ).run()
+        except RangeNotSupported:
+            # yt-dlp downloads (and resumes) it over a single connection instead
+            pass
+        except ProgressHookError as e:
+            # Completed segments are recorded, a later attempt resumes from them
+            raise e.__cause__
+
+    def _stall_limits(self, timeout: float, retries: int) -> Tuple[float, int]:
+        """
+        Socket timeout and retry count for a connection that delivers nothing. No progress hook
+        runs while it waits, so all its attempts together have to end within the stall limit
+        """
+        if not self.stall_timeout:
+            return timeout, retries
+        timeout = min(timeout, self.stall_timeout / 2)
+        return timeout, max(1, min(retries, int(self.stall_timeout // timeout) - 1))
+
+    def _downloaded_size(self, job: 'DownloadJob') -> int:
+        """Bytes fetched over the network for a job"""
+        total = 0
+        for path in job.files:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def _postprocess_opts(self, job: 'DownloadJob') -> dict:
+        """
+        Options for the post-processing stage. Under the copy audio policy, sources
+        already in an acceptable codec are only remuxed and tagged, not re-encoded
+        """
+        if job.format == "video":
+            return job.opts
+        target = _stream_copy_codecs().get(_source_codec(job.info)) if job.audio_policy == AUDIO_COPY else None
+        if not target:
+            job.audio_output = AUDIO_TRANSCODED
+            return job.opts
+
+        job.audio_output = AUDIO_STREAM_COPIED
+        postprocessors = [
+            dict(pp, preferredcodec=target) if pp['key'] == 'FFmpegExtractAudio' else pp
+            for pp in job.opts['postprocessors']
+        ]
+        opts = dict(job.opts, postprocessors=postprocessors, audio_format=target)
+        if target != 'mp3':
+            # The ID3 options only apply to the MP3 muxer
+            opts.pop('postprocessor_args', None)
+        return opts
+
+    def _fused_plan(self, job: 'DownloadJob', opts: dict) -> Optional[Tuple[str, bool]]:
+        """
+        (container, copy audio stream) when the audio chain can run as a single FFmpeg pass
+        Opus output keeps the chain, FFmpeg can't embed cover art in Ogg
+        """
+        from fused_pp import FUSED_CONTAINERS
+        if not self.fused_postprocess or job.format == "video":
+            return None
+        extract = next((pp for pp in opts['postprocessors'] if pp['key'] == 'FFmpegExtractAudio'), None)
+        target = extract.get('preferredcodec') if extract else None
+        if target not in FUSED_CONTAINERS:
+            return None
+        return target, _source_codec(job.info) == FUSED_CONTAINERS[target]
+
+    def _run_postprocessors(self, job: 'DownloadJob', progress: Optional[Progress] = None) -> dict:
+        """Run the post-processing for a job, in one FFmpeg pass where possible"""
+        from yt_dlp.utils import PostProcessingError
+        from fused_pp import FusedAudioPP
+        opts = self._postprocess_opts(job)
+        pp_hooks = [self._postprocessor_hook(job, progress)]
+        fused = self._fused_plan(job, opts)
+
+        if fused:
+            # The chain's extra FFmpeg arguments would be applied to the fused output too
+            fused_opts = {key: value for key, value in opts.items() if key != 'postprocessor_args'}
+            fused_opts['postprocessors'] = []
+            try:
+                with self.pool.acquire(fused_opts, postprocessor_hooks=pp_hooks) as ydl:
+                    target, copy = fused
+                    info = dict(job.info)
+                    info['__postprocessors'] = [FusedAudioPP(ydl, target, job.bitrate, copy)]
+                    info = ydl.post_process(info['filepath'], info)
+                info['__postprocessors'] = []
+                return info
+            except PostProcessingError as e:
+                console.print(f"[yellow]Warning: Single-pass conversion failed for {job.media.title}, "
+                              f"using separate steps: {str(e)}")
+
+        with self.pool.acquire(opts, postprocessor_hooks=pp_hooks) as ydl:
+            return ydl.post_process(job.info['filepath'], job.info)
+
+    def _postprocess(self, job: 'DownloadJob', progress: Optional[Progress] = None) -> bool:
+        """CPU stage: run FFmpeg post-processors on a downloaded file and record the result"""
+        try:
+            if job.opts['postprocessors']:
+                if progress:
+                    progress.update(job.task_id, description=f"[magenta]Converting {job.media.title}...")
+                before = _sibling_files(job.info['filepath'])
+                try:
+                    with tracer.span("postprocess", "postprocess", video_id=job.media.id):
+                        job.info = self._run_postprocessors(job, progress)
+                except BaseException:
+                    # FFmpeg writes some outputs in place, a killed conversion would look finished
+                    for path in _sibling_files(job.info['filepath']) - before:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    raise
+                self._register_files(job, job.info)
+
+            with tracer.span("cleanup", "postprocess", video_id=job.media.id):
+                self._clean_temp_files(job)
+
+            if self.archive:
+                self.archive.record(
+                    job.media.id,
+                    job.format,
+                    job.bitrate,
+                    job.info['filepath'],
+                    job.media.playlist_name if job.is_playlist else None
+                )
+
+            self.retry_queue.remove(job.media, job.format)
+            DOWNLOADS.inc()
+            if job.audio_output:
+                AUDIO_OUTPUTS.inc(mode=job.audio_output)
+
+            console.print(f"[green]Successfully downloaded: {job.media.title}")
+            
+            if progress:
+                progress.remove_task(job.task_id)
+            return True
+
+        except Exception as e:
+            self._fail(job, e, progress, stage='postprocess')
+            return False
+
+    def _job_options(self, job: 'DownloadJob') -> dict:
+        """Download options needed to repeat a job later"""
+        return {
+            'is_playlist': job.is_playlist,
+            'download_video': job.download_video,
+            'keep_video': job.keep_video,
+            'convert_to_audio': job.convert_to_audio,
+            'bitrate': job.bitrate,
+            'audio_policy': job.audio_policy
+        }
+
+    def _fail(self,
+              job: 'DownloadJob',
+              error: Exception,
+              progress: Optional[Progress] = None,
+              stage: str = 'download'):
+        """Report a failed job, queue it for a later retry and drop its progress task"""
+        job.error = error
+        FAILURES.inc(stage=stage, error_class=classify_error(error))
+        try:
+            self.retry_queue.add(
+                job.media,
+                self._job_options(job),
+                job.format,
+                error
+            )
+        except Exception as e:
+            console.print(f"[yellow]Warning: Could not queue {job.media.title} for retry: {str(e)}")
+        console.print(f"[red]Error downloading {job.media.title}: {str(error)}")
+        if progress:
+            progress.remove_task(job.task_id)
+
     def download_media(self, 
                       media: Media,
                       progress: Optional[Progress] = None,
@@ -154,84 +678,452 @@ class YouTubeDownloader:
                       download_video: bool = False,
                       keep_video: bool = True,
                       convert_to_audio: bool = False,
-                      bitrate: str = '192') -> bool:
-        """Download a single media file"""
+                      bitrate: str = '192',
+                      audio_policy: str = AUDIO_MP3,
+                      cancel: Optional[threading.Event] = None) -> bool:
+        """Download a single media file, setting `cancel` stops it and keeps the partial file"""
+        if progress is None:
+            with self._progress() as progress:
+                return self.download_media(
+                    media,
+                    progress,
+                    is_playlist,
+                    download_video,
+                    keep_video,
+                    convert_to_audio,
+                    bitrate,
+                    audio_policy,
+                    cancel
+                )
+
+        fmt = media_format(download_video, convert_to_audio, audio_policy)
+        if self._link_existing(media, is_playlist, fmt, bitrate):
+            return True
+
         try:
-            task_id = progress.add_task(f"[cyan]Downloading {media.title}...", total=None) if progress else None
-            
-            opts = self._get_ydl_opts(
+            job = self._prepare_job(
                 media,
+                progress,
                 is_playlist,
                 download_video,
                 keep_video,
                 convert_to_audio,
-                bitrate
+                bitrate,
+                audio_policy
             )
-            
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                url = f"http://www.youtube.com/watch?v={media.id}"
-                ydl.download([url])
-            
-            # Clean up temporary and duplicate files
-            if download_video:
-                video_path = self._get_output_path(media, is_playlist, "video")
-                self._clean_temp_files(video_path, media.title)
-            if convert_to_audio or not download_video:
-                audio_path = self._get_output_path(media, is_playlist, "audio")
-                self._clean_temp_files(audio_path, media.title)
-                
-            console.print(f"[green]Successfully downloaded: {media.title}")
-            
-            if progress:
-                progress.remove_task(task_id)
-            return True
-
         except Exception as e:
             console.print(f"[red]Error downloading {media.title}: {str(e)}")
-            if progress:
-                progress.remove_task(task_id)
             return False
 
+        for attempt in range(self.max_requeues + 1):
+            job.watch = ItemWatch(self.item_timeout, self.stall_timeout, cancel)
+            if self._fetch(job, progress):
+                return self._postprocess(job, progress)
+            if not self._requeue(job, attempt):
+                break
+        progress.remove_task(job.task_id)
+        return False
+
+    def _requeue(self, job: 'DownloadJob', attempt: int) -> bool:
+        """
+        Whether to try a failed download again: only a timed out or stalled one, at most
+        max_requeues times, after which it is recorded for a later retry like any failure
+        """
+        reason = job.watch.reason if job.watch else None
+        if reason is None or reason == ABORT_CANCELLED:
+            return False
+        if attempt < self.max_requeues:
+            console.print(f"[yellow]{job.media.title}: download {job.watch.describe()}, re-queued to resume it")
+            return True
+        self._fail(job, job.error)
+        return False
+
     def download_playlist(self, 
-                         media_list: List[Media],
+                         media_list: Iterable[Media],
                          download_video: bool = False,
                          keep_video: bool = True,
                          convert_to_audio: bool = False,
-                         bitrate: str = '192'):
-        """Download multiple media files using thread pool"""
-        total_items = len(media_list)
-        success_count = 0
-        failed_count = 0
-
-        console.print(f"[cyan]Starting download of {total_items} items...")
-
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
-        ) as progress:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = [
-                    executor.submit(
-                        self.download_media,
-                        media,
-                        progress,
-                        True,
-                        download_video,
-                        keep_video,
-                        convert_to_audio,
-                        bitrate
-                    )
-                    for media in media_list
-                ]
-                for future in futures:
-                    if future.result():
-                        success_count += 1
-                    else:
-                        failed_count += 1
+                         bitrate: str = '192',
+                         audio_policy: str = AUDIO_MP3,
+                         on_done: Optional[Callable[[Media, bool], None]] = None,
+                         cancel: Optional[threading.Event] = None,
+                         order: str = ORDER_PLAYLIST,
+                         on_release: Optional[Callable[[Media], None]] = None):
+        """
+        Download multiple media files as a two-stage pipeline: a network pool of
+        `max_workers` feeds a bounded queue drained by `postprocess_workers` FFmpeg workers.
+        When min_workers < max_workers the number of active downloads adapts to throughput.
+        `on_done(media, ok)` is called once per item when it is finished, skipped or failed;
+        `on_release(media)` once per item taken from `media_list` whatever its outcome,
+        including cancelled items and errors, after any on_done.
+        Once `cancel` is set, or on Ctrl+C, no further items are started and running downloads
+        stop at their next progress update, keeping their partial files to resume from; queued
+        conversions still run. Items start in `order` (see scheduling.ORDER_POLICIES); any order
+        but the playlist's waits for a streamed playlist to be fully resolved first
+        """
+        cancel = cancel if cancel is not None else threading.Event()
+        counts = {
+            'submitted': 0, 'success': 0, 'failed': 0, 'skipped': 0, 'changed': 0, 'linked': 0, 'cancelled': 0,
+            'interrupted': 0, 'requeued': 0, AUDIO_STREAM_COPIED: 0, AUDIO_TRANSCODED: 0
+        }
+        counts_lock = threading.Lock()
+        # Downloaders block here once the converters fall behind
+        pp_queue: queue.Queue = queue.Queue(maxsize=self.postprocess_workers)
+        fmt = media_format(download_video, convert_to_audio, audio_policy)
+
+        bandwidth_start = self.bandwidth.snapshot()
+
+        if order != ORDER_PLAYLIST:
+            media_list = list(media_list)
+            # Playlist positions, to estimate afterwards how long playlist order would have taken
+            positions = {id(media): index for index, media in enumerate(media_list)}
+            media_list = order_media(media_list, order, download_video)
+        else:
+            positions = None
+
+        if isinstance(media_list, list):
+            console.print(f"[cyan]Starting download of {len(media_list)} items...")
+        else:
+            console.print("[cyan]Starting downloads as playlist items are resolved...")
+
+        # (playlist position, seconds in the download stage) of every item started
+        timings: List[Tuple[int, float]] = []
+        stage = {'start': None, 'end': None}
+
+        def release(media: Media):
+            if on_release:
+                on_release(media)
+
+        def pending_media() -> Iterator[Media]:
+            """Lazily drop items the archive already has on disk with the same settings"""
+            for media in media_list:
+                if cancel.is_set():
+                    release(media)
+                    return
+                if self.archive:
+                    status = self.archive.status(media.id, fmt, bitrate, media.playlist_name)
+                    if status == STATUS_DONE:
+                        counts['skipped'] += 1
+                        if on_done:
+                            on_done(media, True)
+                        release(media)
+                        continue
+                    # Already downloaded for another playlist or as a single file
+                    if self._link_existing(media, True, fmt, bitrate):
+                        counts['linked'] += 1
+                        if on_done:
+                            on_done(media, True)
+                        release(media)
+                        continue
+                    if status == STATUS_CHANGED:
+                        counts['changed'] += 1
+                counts['submitted'] += 1
+                yield media
+
+        def count(media: Media, ok: bool, job: Optional[DownloadJob] = None):
+            with counts_lock:
+                counts['success' if ok else 'failed'] += 1
+                if ok and job and job.audio_output:
+                    counts[job.audio_output] += 1
+            if on_done:
+                on_done(media, ok)
+
+        limiter = AdaptiveConcurrency(
+            self.min_workers,
+            self.max_workers,
+            initial=min(4, self.max_workers),
+            pressure=pp_queue.full
+        )
+
+        def fetch(media: Media) -> bool:
+            """Download stage of one item; True once it was handed to the converters"""
+            job: Optional[DownloadJob] = None
+            attempt = 0
+            while True:
+                with tracer.span("wait_for_slot", "scheduling", video_id=media.id):
+                    limiter.acquire()
+                downloaded_bytes = 0
+                error: Optional[Exception] = None
+                started = time.monotonic()
+                slot: Optional[int] = None
+                try:
+                    # Lists are submitted all at once, so items queued before a cancel are dropped here
+                    if cancel.is_set():
+                        with counts_lock:
+                            counts['cancelled' if job is None else 'interrupted'] += 1
+                        if job is not None:
+                            progress.remove_task(job.task_id)
+                        return
+                    with counts_lock:
+                        stage['start'] = stage['start'] or started
+                        position = positions[id(media)] if positions else len(timings)
+                        timings.append((position, 0.0))
+                        slot = len(timings) - 1
+                    if job is None:
+                        try:
+                            job = self._prepare_job(
+                                media, progress, True, download_video, keep_video, convert_to_audio, bitrate,
+                                audio_policy
+                            )
+                        except Exception as e:
+                            console.print(f"[red]Error downloading {media.title}: {str(e)}")
+                            error = e
+                            count(media, False)
+                            return
+                    job.watch = ItemWatch(self.item_timeout, self.stall_timeout, cancel)
+                    if self._fetch(job, progress, on_bytes):
+                        downloaded_bytes = self._downloaded_size(job)
+                        break
+                    error = job.error
+                    if job.watch.reason == ABORT_CANCELLED:
+                        # Not a failure: the partial file stays and the item isn't reported as done
+                        with counts_lock:
+                            counts['interrupted'] += 1
+                        progress.remove_task(job.task_id)
+                        return
+                    if self._requeue(job, attempt):
+                        # Give the slot up and wait for one again behind the items already waiting
+                        attempt += 1
+                        with counts_lock:
+                            counts['requeued'] += 1
+                        continue
+                    progress.remove_task(job.task_id)
+                    count(media, False)
+                    return
+                finally:
+                    limiter.release(downloaded_bytes, error)
+                    finished = time.monotonic()
+                    with counts_lock:
+                        if slot is not None:
+                            timings[slot] = (timings[slot][0], finished - started)
+                            stage['end'] = max(stage['end'] or finished, finished)
+            # Queue outside the slot so a full queue doesn't count against download throughput
+            with tracer.span("wait_for_converter", "scheduling", video_id=media.id):
+                pp_queue.put(job)
+            return True
+
+        def download(media: Media):
+            handed_off = False
+            try:
+                handed_off = fetch(media)
+            finally:
+                # Every way out of the download stage but the converters' queue ends the item here
+                if not handed_off:
+                    release(media)
+
+        totals = {'total': 0}
+        totals_lock = threading.Lock()
+
+        def on_bytes(downloaded: int, total: int):
+            """Fold one item's byte progress into the aggregate bar"""
+            with totals_lock:
+                totals['total'] += total
+                progress.update(overall_task, advance=downloaded, total=totals['total'] or None)
+
+        def postprocess_worker():
+            while True:
+                job = pp_queue.get()
+                if job is None:
+                    return
+                try:
+                    count(job.media, self._postprocess(job, progress), job)
+                finally:
+                    release(job.media)
+
+        with self._progress() as progress:
+            overall_task = progress.add_task("[bold cyan]All downloads", total=None)
+            pp_threads = [
+                threading.Thread(target=postprocess_worker, name=f"postprocess_{index}", daemon=True)
+                for index in range(self.postprocess_workers)
+            ]
+            for thread in pp_threads:
+                thread.start()
+
+            interrupted = False
+            stopped = False
+            try:
+                # Items are submitted as the iterable yields, so streamed items start downloading immediately,
+                # and only a few ahead of the free slots, so a long listing isn't read into queued tasks
+                submit_slots = threading.BoundedSemaphore(self.max_workers * 2)
+                errors: List[BaseException] = []
+
+                def done(future):
+                    submit_slots.release()
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+
+                executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download")
+                items = pending_media()
+                try:
+                    for media in items:
+                        submit_slots.acquire()
+                        executor.submit(download, media).add_done_callback(done)
+                except KeyboardInterrupt:
+                    interrupted = True
+                    self._cancel_run(cancel)
+                except Exception as e:
+                    # A streamed listing that fails: let the items already started finish, then report it
+                    errors.append(e)
+                finally:
+                    items.close()
+                    # Stops a streamed listing's resolvers or a job queue's heartbeat
+                    if hasattr(media_list, 'close'):
+                        media_list.close()
+                interrupted = self._wait_for_workers(lambda: executor.shutdown(wait=True), cancel) or interrupted
+                if errors:
+                    raise errors[0]
+            except KeyboardInterrupt:
+                # Ctrl+C on a cancelled run: stop waiting, the downloads end at their next progress update
+                stopped = True
+                raise
+            finally:
+                if not stopped:
+                    for _ in pp_threads:
+                        pp_queue.put(None)
+                    interrupted = self._wait_for_workers(
+                        lambda: [thread.join() for thread in pp_threads], cancel
+                    ) or interrupted
 
         # Print summary
         console.print(f"\n[green]Download Summary:")
-        console.print(f"[green]Successfully downloaded: {success_count} items")
-        if failed_count > 0:
-            console.print(f"[yellow]Failed downloads: {failed_count} items")
\ No newline at end of file
+        console.print(f"[green]Successfully downloaded: {counts['success']} items")
+        if self.archive:
+            console.print(f"[cyan]Archive: {counts['submitted'] - counts['changed']} new, {counts['changed']} changed, "
+                          f"{counts['skipped']} already downloaded")
+            if counts['linked']:
+                console.print(f"[cyan]Deduplicated: {counts['linked']} items reused from other folders instead of downloading")
+        if audio_policy == AUDIO_COPY and counts['success']:
+            console.print(f"[cyan]Audio: {counts[AUDIO_STREAM_COPIED]} stream-copied, "
+                          f"{counts[AUDIO_TRANSCODED]} transcoded to MP3")
+        bandwidth_end = self.bandwidth.snapshot()
+        achieved = BandwidthLimiter.achieved(bandwidth_start, bandwidth_end) / (1024 * 1024)
+        if bandwidth_end['rate']:
+            console.print(f"[cyan]Bandwidth: {achieved:.2f} MB/s achieved of {bandwidth_end['rate'] / (1024 * 1024):.2f} MB/s allowed")
+        else:
+            console.print(f"[cyan]Bandwidth: {achieved:.2f} MB/s achieved (unlimited)")
+        if limiter.adaptive:
+            console.print(f"[cyan]Concurrency: ended at {limiter.limit} downloads "
+                          f"(peak {limiter.peak_limit}, range {limiter.min_limit}-{limiter.max_limit}, "
+                          f"{limiter.backoffs} throttling backoffs)")
+        if counts['failed'] > 0:
+            console.print(f"[yellow]Failed downloads: {counts['failed']} items")
+        if counts['requeued']:
+            console.print(f"[yellow]Re-queued: {counts['requeued']} downloads that timed out or stalled")
+        if cancel.is_set():
+            console.print(f"[yellow]Cancelled: {counts['cancelled']} queued items were not started, "
+                          f"{counts['interrupted']} downloads were stopped (partial files are kept to resume from)")
+        if len(timings) > 1:
+            self._print_schedule(order, timings, stage['end'] - stage['start'], limiter.peak_limit)
+        if interrupted:
+            raise KeyboardInterrupt
+
+    def _progress(self) -> Progress:
+        """Progress display for one download call, tracked but never drawn without live_progress"""
+        return Progress(*_progress_columns(), console=console, disable=not self.live_progress)
+
+    def _cancel_run(self, cancel: threading.Event):
+        cancel.set()
+        console.print("\n[yellow]Cancelling: no new downloads start, running ones stop and keep their partial files, "
+                      "queued conversions finish. Press Ctrl+C again to stop waiting")
+
+    def _wait_for_workers(self, wait: Callable[[], object], cancel: threading.Event) -> bool:
+        """
+        Block on `wait`. Ctrl+C cancels the run and keeps waiting for the workers to wind
+        down, Ctrl+C on a run that is already cancelled propagates
+        Returns: whether the run was cancelled with Ctrl+C while waiting
+        """
+        interrupted = False
+        while True:
+            try:
+                wait()
+                return interrupted
+            except KeyboardInterrupt:
+                if cancel.is_set():
+                    raise
+                interrupted = True
+                self._cancel_run(cancel)
+
+    def _print_schedule(self, order: str, timings: List[Tuple[int, float]], elapsed: float, workers: int):
+        """
+        Compare the download stage's makespan with what another start order would have taken,
+        replaying the measured item times on the same number of download slots
+        """
+        ordered = [seconds for _, seconds in timings]
+        simulated = simulate_makespan(ordered, workers)
+        if order == ORDER_PLAYLIST:
+            other_order = ORDER_LONGEST
+            other = simulate_makespan(sorted(ordered, reverse=True), workers)
+        else:
+            other_order = ORDER_PLAYLIST
+            other = simulate_makespan([seconds for _, seconds in sorted(timings)], workers)
+        change = (other / simulated - 1) * 100 if simulated else 0.0
+        console.print(f"[cyan]Schedule: {ORDER_LABELS[order]}, downloads took {elapsed:.1f}s; "
+                      f"{ORDER_LABELS[other_order]} would take ~{other:.1f}s vs ~{simulated:.1f}s for this order "
+                      f"with the same item times ({abs(change):.0f}% {'longer' if change >= 0 else 'shorter'})")
+
+    def work_queue(self, job_queue: 'JobQueue'):
+        """
+        Download items claimed from a job queue shared with other processes or hosts until it is drained.
+        Claims stay within what this worker's download and post-processing slots can take
+        """
+        from job_queue import (
+            STATUS_PENDING as JOB_PENDING, STATUS_LEASED as JOB_LEASED, STATUS_DONE as JOB_DONE,
+            STATUS_FAILED as JOB_FAILED
+        )
+        options = job_queue.options()
+        if options is None:
+            console.print("[yellow]The job queue is empty")
+            return
+
+        counts = job_queue.counts()
+        console.print(f"[cyan]Job queue: {counts[JOB_PENDING]} pending, {counts[JOB_LEASED]} claimed by workers, "
+                      f"{counts[JOB_DONE]} done (worker {job_queue.owner})")
+        try:
+            self.download_playlist(
+                job_queue.iter_claims(self.max_workers + self.postprocess_workers),
+                on_done=job_queue.complete,
+                on_release=job_queue.settle,
+                **options
+            )
+        finally:
+            # Anything claimed but not finished, e.g. after Ctrl+C, goes straight back to the other workers
+            released = job_queue.release()
+            if released:
+                console.print(f"[yellow]Returned {released} unfinished items to the job queue")
+
+        counts = job_queue.counts()
+        console.print(f"[cyan]Job queue: {counts[JOB_DONE]} done, {counts[JOB_FAILED]} failed, "
+                      f"{counts[JOB_PENDING] + counts[JOB_LEASED]} left")
+
+    def retry_failed(self, ignore_backoff: bool = False):
+        """Re-run queued failures whose backoff has expired, grouped by their original options"""
+        items = self.retry_queue.due(ignore_backoff)
+        counts = self.retry_queue.counts()
+
+        if not items:
+            console.print("[green]No failed downloads are due for a retry")
+        else:
+            console.print(f"[cyan]Retrying {len(items)} failed downloads...")
+            groups = {}
+            for item in items:
+                key = tuple(sorted(item.options.items()))
+                groups.setdefault(key, []).append(item.media)
+
+            for key, media_list in groups.items():
+                options = dict(key)
+                is_playlist = options.pop('is_playlist')
+                if is_playlist:
+                    self.download_playlist(media_list, **options)
+                else:
+                    for media in media_list:
+                        self.download_media(media, **options)
+
+            counts = self.retry_queue.counts()
+
+        if counts.get('waiting'):
+            console.print(f"[yellow]{counts['waiting']} failed items are still backing off (use -a to retry now)")
+        permanent = self.retry_queue.permanent()
+        if permanent:
+            console.print(f"[yellow]{len(permanent)} items failed permanently and will not be retried:")
+            for item in permanent:
+                console.print(f"[dim]  {item.media.title} ({item.media.id}): {item.error}")
@@ -0,0 +1,102 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+# Encoders the downloader relies on: MP3 and AAC audio, and JPEG cover art
+REQUIRED_ENCODERS = ('libmp3lame', 'aac', 'mjpeg')
+# ` A....D aac  AAC (Advanced Audio Coding)`, the legend lines above the list have `=` as their name
+ENCODER_LINE_RE = re.compile(r'^\s*([VAS][A-Z.]{5})\s+(\w[\w-]*)', re.MULTILINE)
+
+def default_cache_path() -> str:
+    """Per-user cache file, outside any output directory since the probe runs before options are parsed"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "tube-downloader", "ffmpeg.json")
+
+@dataclass
+class FFmpegCapabilities:
+    ffmpeg: Optional[str] = None
+    ffprobe: Optional[str] = None
+    version: Optional[str] = None
+    encoders: List[str] = field(default_factory=list)
+    # Identity of the binaries the probe ran against, a changed binary invalidates it
+    stamp: List[list] = field(default_factory=list)
+
+    @property
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    def missing_encoders(self) -> List[str]:
+        return [name for name in REQUIRED_ENCODERS if name not in self.encoders]
+
+def _stamp(*paths: Optional[str]) -> List[list]:
+    """Path, mtime and size of each binary, as a cache key"""
+    stamp = []
+    for path in paths:
+        if path:
+            st = os.stat(path)
+            stamp.append([path, st.st_mtime_ns, st.st_size])
+        else:
+            stamp.append([None, 0, 0])
+    return stamp
+
+def _run(args: List[str]) -> str:
+    result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=30)
+    return result.stdout
+
+def _probe(ffmpeg: Optional[str], ffprobe: Optional[str], stamp: List[list]) -> FFmpegCapabilities:
+    """Run the binaries to read the version and the list of encoders"""
+    capabilities = FFmpegCapabilities(ffmpeg=ffmpeg, ffprobe=ffprobe, stamp=stamp)
+    if not ffmpeg:
+        return capabilities
+    version = _run([ffmpeg, '-version']).splitlines()
+    capabilities.version = version[0].strip() if version else None
+    encoders = _run([ffmpeg, '-hide_banner', '-encoders'])
+    capabilities.encoders = sorted(name for _, name in ENCODER_LINE_RE.findall(encoders))
+    return capabilities
+
+def probe_ffmpeg(cache_path: Optional[str] = None, refresh: bool = False) -> FFmpegCapabilities:
+    """
+    FFmpeg/ffprobe location, version and encoders. The result is cached and reused
+    until either binary is replaced (path, mtime or size changes), so a normal start
+    only looks the binaries up on PATH instead of spawning FFmpeg
+    """
+    ffmpeg, ffprobe = shutil.which('ffmpeg'), shutil.which('ffprobe')
+    try:
+        stamp = _stamp(ffmpeg, ffprobe)
+    except OSError:
+        stamp = []
+    cache_path = cache_path or default_cache_path()
+
+    if not refresh and stamp:
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                cached = FFmpegCapabilities(**json.load(f))
+            if cached.stamp == stamp:
+                return cached
+        except (OSError, ValueError, TypeError):
+            pass
+
+    try:
+        capabilities = _probe(ffmpeg, ffprobe, stamp)
+    except (OSError, subprocess.SubprocessError):
+        # Found on PATH but not runnable (wrong architecture, missing libraries)
+        return FFmpegCapabilities(ffprobe=ffprobe, stamp=stamp)
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(capabilities), f)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # A read-only home only costs the probe on every start
+        pass
+    return capabilities
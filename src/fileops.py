@@ -0,0 +1,52 @@
+import os
+import shutil
+import sys
+
+LINK_HARDLINK = "hardlink"
+LINK_REFLINK = "reflink"
+LINK_COPY = "copy"
+
+# Linux ioctl that shares the source's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+def _reflink(source: str, target: str) -> bool:
+    """Copy-on-write clone of `source`, False where the platform or filesystem can't do it"""
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(target)
+        except OSError:
+            pass
+        return False
+
+def link_or_copy(source: str, target: str) -> str:
+    """
+    Make `target` an identical file to `source` as cheaply as possible:
+    a hardlink, else a reflink (e.g. across btrfs subvolumes), else a full copy.
+    An existing `target` is replaced atomically.
+    Returns: the method used
+    """
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    temp_path = f"{target}.link-tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    try:
+        os.link(source, temp_path)
+        method = LINK_HARDLINK
+    except OSError:
+        # Different filesystem, or one without hardlinks (FAT/exFAT drives)
+        if _reflink(source, temp_path):
+            method = LINK_REFLINK
+        else:
+            shutil.copy2(source, temp_path)
+            method = LINK_COPY
+
+    os.replace(temp_path, target)
+    return method
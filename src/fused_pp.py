@@ -0,0 +1,72 @@
+import itertools
+import os
+from typing import Optional
+from yt_dlp.postprocessor.ffmpeg import FFmpegMetadataPP
+from yt_dlp.utils import PostProcessingError, prepend_extension, replace_extension
+
+# Containers the fused step can write with an embedded cover, and the audio codec copied into them
+FUSED_CONTAINERS = {'mp3': 'mp3', 'm4a': 'aac'}
+
+class FusedAudioPP(FFmpegMetadataPP):
+    """
+    Extract audio, write tags and embed the cover art in a single FFmpeg run.
+    Replaces the FFmpegExtractAudio -> FFmpegMetadata -> EmbedThumbnail chain,
+    which rewrites the output file once per step.
+    """
+
+    def __init__(self, downloader=None, target: str = 'mp3', bitrate: Optional[str] = '192', copy: bool = False):
+        super().__init__(downloader, add_metadata=True, add_chapters=False, add_infojson=False)
+        if target not in FUSED_CONTAINERS:
+            raise ValueError(f"Unsupported fused output format: {target}")
+        self.target = target
+        self.bitrate = bitrate
+        # Keep the source audio stream instead of encoding it
+        self.copy = copy
+
+    @staticmethod
+    def _thumbnail(info: dict) -> Optional[str]:
+        """The best thumbnail written during the download, if any"""
+        for thumbnail in reversed(info.get('thumbnails') or []):
+            path = thumbnail.get('filepath')
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def run(self, info):
+        source = info['filepath']
+        thumbnail = self._thumbnail(info)
+        target = replace_extension(source, self.target, info['ext'])
+        temp_path = prepend_extension(target, 'temp')
+
+        options = ['-map', '0:a:0']
+        if self.copy:
+            options += ['-c:a', 'copy']
+        elif self.target == 'mp3':
+            options += ['-c:a', 'libmp3lame', '-b:a', f'{self.bitrate}k']
+        else:
+            options += ['-c:a', 'aac', '-b:a', f'{self.bitrate}k']
+        if thumbnail:
+            options += [
+                '-map', '1:v:0', '-c:v', 'mjpeg', '-disposition:v:0', 'attached_pic',
+                '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)',
+            ]
+        if self.target == 'mp3':
+            options += ['-id3v2_version', '3']
+        options += itertools.chain.from_iterable(self._get_metadata_opts(info))
+
+        self.to_screen(f'Destination: {target}')
+        try:
+            self.run_ffmpeg_multiple_files([source, thumbnail], temp_path, options)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise PostProcessingError(f'fused audio post-processing failed: {e}')
+        os.replace(temp_path, target)
+
+        files_to_delete = [thumbnail] if thumbnail else []
+        if target != source:
+            files_to_delete.append(source)
+        info['filepath'] = target
+        info['ext'] = self.target
+        info['acodec'] = FUSED_CONTAINERS[self.target]
+        return files_to_delete, info
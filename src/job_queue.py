@@ -0,0 +1,262 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Iterable, Iterator, List, Optional
+from media import Media
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+DEFAULT_LEASE = 120.0
+
+def default_owner() -> str:
+    """Worker identity recorded on leases: host, process and a random suffix"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class JobQueue:
+    """
+    Shared SQLite queue of playlist items that several downloader processes, on one host
+    or on hosts sharing the file, split between them. Workers claim items atomically under
+    a lease that a heartbeat keeps renewing; items of a worker that dies are claimed again
+    once its lease runs out, items that keep losing their lease are given up on.
+    The database uses a rollback journal rather than WAL so it also works on network
+    filesystems, which still need working POSIX locks (NFSv4, or NFSv3 with lockd).
+    """
+
+    def __init__(self,
+                 path: str,
+                 lease: float = DEFAULT_LEASE,
+                 max_attempts: int = 3,
+                 owner: Optional[str] = None):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.owner = owner or default_owner()
+        self._lock = threading.Lock()
+        # Claimed items the worker hasn't settled yet, bounded by iter_claims
+        self._outstanding = 0
+        self._completed = threading.Condition(self._lock)
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Other workers hold the write lock only for the length of a claim
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                position INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL,
+                playlist TEXT NOT NULL,
+                record TEXT NOT NULL,
+                info BLOB,
+                status TEXT NOT NULL,
+                owner TEXT,
+                lease_expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                UNIQUE (id, playlist)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, position)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the heartbeat, hand back unfinished leases and close the database"""
+        self._stop_heartbeat()
+        self.release()
+        with self._lock:
+            self._conn.close()
+
+    def options(self) -> Optional[dict]:
+        """Download options every item of the queue is fetched with, None for an empty queue"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'options'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add(self, media_items: Iterable[Media], options: dict) -> int:
+        """
+        Queue resolved media to be downloaded with `options`; items already queued are kept as they are
+        Returns: the number of new items
+        """
+        now = time.time()
+        added = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'options'").fetchone()
+                if row and json.loads(row[0]) != options:
+                    raise ValueError("The job queue already holds items with different download options")
+                if not row:
+                    self._conn.execute("INSERT INTO meta (key, value) VALUES ('options', ?)", (json.dumps(options),))
+                for media in media_items:
+                    # Workers on other hosts can start from the resolved formats while their URLs are valid
+                    info = zlib.compress(json.dumps(media.info, separators=(',', ':')).encode('utf-8')) \
+                        if media.info else None
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO jobs (id, playlist, record, info, status, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (media.id, media.playlist_name or "", media.to_save_format(), info, STATUS_PENDING, now)
+                    )
+                    added += cursor.rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def claim(self, count: int) -> List[Media]:
+        """Lease up to `count` pending items, or items whose worker stopped renewing its lease, in queue order"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Items that took a worker down with them every time they were tried
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, owner = NULL, updated_at = ? "
+                    "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                    (STATUS_FAILED, now, STATUS_LEASED, now, self.max_attempts)
+                )
+                rows = self._conn.execute(
+                    "SELECT position, record, info FROM jobs "
+                    "WHERE status = ? OR (status = ? AND lease_expires_at < ?) ORDER BY position LIMIT ?",
+                    (STATUS_PENDING, STATUS_LEASED, now, count)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = ?, owner = ?, lease_expires_at = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE position = ?",
+                    [(STATUS_LEASED, self.owner, now + self.lease, now, position) for position, _, _ in rows]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._outstanding += len(rows)
+
+        claimed = []
+        for _, record, info in rows:
+            media = Media.from_save_format(record)
+            media.is_from_metadata = False
+            media.info = json.loads(zlib.decompress(info)) if info else None
+            claimed.append(media)
+        return claimed
+
+    def heartbeat(self) -> int:
+        """Extend the leases this worker holds; returns how many it still has"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status = ?",
+                (now + self.lease, self.owner, STATUS_LEASED)
+            )
+        return cursor.rowcount
+
+    def complete(self, media: Media, ok: bool):
+        """Record the outcome of a claimed item, unless its lease was already taken over by another worker"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, updated_at = ? "
+                "WHERE id = ? AND playlist = ? AND owner = ? AND status = ?",
+                (STATUS_DONE if ok else STATUS_FAILED, time.time(), media.id, media.playlist_name or "",
+                 self.owner, STATUS_LEASED)
+            )
+
+    def settle(self, media: Media):
+        """
+        Free the claim slot of an item the worker is done with, whatever happened to it:
+        completed, failed, cancelled or stopped by an error. Unfinished items keep their
+        lease until release() or its expiry
+        """
+        with self._lock:
+            self._outstanding = max(0, self._outstanding - 1)
+            self._completed.notify_all()
+
+    def release(self) -> int:
+        """Hand this worker's unfinished items back to the queue without counting the attempt"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_expires_at = NULL, attempts = attempts - 1, "
+                "updated_at = ? WHERE owner = ? AND status = ?",
+                (STATUS_PENDING, time.time(), self.owner, STATUS_LEASED)
+            )
+            self._outstanding = 0
+        return cursor.rowcount
+
+    def counts(self) -> dict:
+        """Number of items per status"""
+        with self._lock:
+            result = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: result.get(status, 0) for status in (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED)}
+
+    def _next_expiry(self) -> Optional[float]:
+        """When the earliest lease held by another worker runs out, None if no other worker holds one"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(lease_expires_at) FROM jobs WHERE status = ? AND owner != ?",
+                (STATUS_LEASED, self.owner)
+            ).fetchone()
+        return row[0]
+
+    def _start_heartbeat(self):
+        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
+            return
+        self._heartbeat_stop.clear()
+
+        def beat():
+            # Several renewals fit in one lease, so a single slow write doesn't lose it
+            while not self._heartbeat_stop.wait(self.lease / 4):
+                try:
+                    self.heartbeat()
+                except sqlite3.Error:
+                    pass
+
+        self._heartbeat_thread = threading.Thread(target=beat, name="queue_heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def _stop_heartbeat(self):
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+
+    def iter_claims(self, in_flight: int, poll_interval: float = 5.0) -> Iterator[Media]:
+        """
+        Yield claimed items while keeping at most `in_flight` of them unsettled, so a worker
+        only takes what it can start on and the rest stays available to other workers.
+        Ends once nothing is pending and no other worker holds a lease that could still expire.
+        """
+        self._start_heartbeat()
+        try:
+            while True:
+                with self._lock:
+                    while self._outstanding >= in_flight:
+                        self._completed.wait()
+                    free = in_flight - self._outstanding
+
+                claimed = self.claim(free)
+                yield from claimed
+                if claimed:
+                    continue
+
+                # Nothing claimable: wait for our own items, or for another worker's lease to lapse
+                expiry = self._next_expiry()
+                with self._lock:
+                    if expiry is None and self._outstanding == 0:
+                        return
+                    timeout = poll_interval if expiry is None else min(poll_interval, max(0.1, expiry - time.time()))
+                    self._completed.wait(timeout)
+        finally:
+            self._stop_heartbeat()
@@ -2,20 +2,31 @@ from rich.console import Console
 from rich.prompt import Prompt
 from rich.panel import Panel
 from downloader import YouTubeDownloader
-from youtube import get_playlist_media, get_single_video_info, process_url
-import subprocess
+from cache import MetadataCache
+from archive import media_format, AUDIO_POLICIES
+from scheduling import ORDER_PLAYLIST, ORDER_POLICIES, order_media
+from manifest import PlaylistManifest, DEFAULT_MANIFEST_TTL, manifest_path
+from ydl_pool import shared_pool
+from bandwidth import shared_limiter
+from watchdog import DEFAULT_STALL_TIMEOUT
+from metrics import metrics
+from tracing import tracer
+from youtube import get_playlist_media, get_single_video_info, iter_playlist_media, process_url
+from ffmpeg_probe import probe_ffmpeg
 import sys
+import os
 import platform
 
 console = Console()
+DOWNLOAD_CANCELLED = "[yellow]Download cancelled, run the same command again to resume it"
 
 def check_ffmpeg():
-    """Check if FFmpeg is installed and accessible"""
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return True
-    except FileNotFoundError:
-        return False
+    """Check if FFmpeg is installed and accessible, from the cached probe unless the binary changed"""
+    capabilities = probe_ffmpeg()
+    if capabilities.available and capabilities.missing_encoders():
+        console.print(f"[yellow]Warning: this FFmpeg build lacks the {', '.join(capabilities.missing_encoders())} "
+                      f"encoder(s), some conversions will fail")
+    return capabilities.available
 
 def display_ffmpeg_instructions():
     """Display FFmpeg installation instructions based on the operating system"""
@@ -72,30 +83,98 @@ def display_help():
     console.print("    Options:")
     console.print("      [dim]-n <number>[/dim] - Download only first N items")
     console.print("      [dim]-r[/dim] - Reverse playlist order")
+    console.print("      [dim]-ord <playlist|longest|shortest|size>[/dim] - Download start order: playlist order (default), "
+                  "longest first (shortest total time), shortest first (first files soonest) or largest expected size first")
     console.print("      [dim]-b <bitrate>[/dim] - Set MP3 bitrate (128, 192, 256, 320)")
+    console.print("      [dim]-af <mp3|copy>[/dim] - Audio policy: always transcode to MP3 (default) or keep AAC/Opus/MP3 streams as-is")
     console.print("      [dim]-v[/dim] - Download video (default is audio only)")
     console.print("      [dim]-ka[/dim] - Keep audio when downloading video")
     console.print("      [dim]-kv[/dim] - Keep video files (default for video downloads)")
     console.print("      [dim]-o <output_dir>[/dim] - Specify output directory")
     console.print("      [dim]-pn <name>[/dim] - Custom playlist folder name")
     console.print("      [dim]-so[/dim] - Download only songs from playlist (filters out non-music content)")
+    console.print("      [dim]-rw <number>[/dim] - Parallel metadata resolvers for playlists (default 8)")
+    console.print("      [dim]-w <number>[/dim] - Fixed number of parallel downloads")
+    console.print("      [dim]-wmin <number>[/dim] / [dim]-wmax <number>[/dim] - Bounds for adaptive parallel downloads (default 2-8)")
+    console.print("      [dim]-pw <number>[/dim] - Parallel FFmpeg post-processing workers (default: CPU count)")
+    console.print("      [dim]-sp[/dim] - Convert, tag and embed cover art in separate FFmpeg steps instead of one pass")
+    console.print("      [dim]-sc <number>[/dim] - Parallel range connections per file (default 1)")
+    console.print("      [dim]-ss <MB>[/dim] - Segment size for multi-connection downloads (default 8)")
+    console.print("      [dim]-bw <MB/s>[/dim] - Limit total download bandwidth across all workers")
+    console.print("      [dim]-ibw <MB/s>[/dim] - Limit download bandwidth per item")
+    console.print("      [dim]-it <seconds>[/dim] - Stop a download that takes longer and re-queue it (default: no limit)")
+    console.print("      [dim]-st <seconds>[/dim] - Stop a download without progress for this long and re-queue it "
+                  "(default 60, 0 disables)")
+    console.print("      [dim]-nc[/dim] - Bypass the metadata cache")
+    console.print("      [dim]-rl[/dim] - Reuse a playlist listing less than an hour old instead of listing it again "
+                  "(an interrupted run's listing is always reused to resume it)")
+    console.print("      [dim]-ns[/dim] - apl only: resolve the whole playlist before downloading")
+    console.print("      [dim]-na[/dim] - Ignore the download archive (re-download finished items)")
+    console.print("      [dim]-m <file>[/dim] - Export metrics after the command (Prometheus text, or JSON for .json files)")
+    console.print("      [dim]-t <file>[/dim] - Record a per-stage timeline (Chrome trace, or JSON lines for .jsonl files)")
+    console.print("      [dim]-q <file>[/dim] - pl/apl: add the items to a shared job queue, then work on it like 'work'")
     console.print("    Example: pl URL -n 5 -r -b 320 -v -ka -o /downloads")
+    console.print("  [cyan]retry [-a] [-o <output_dir>] [-bw <MB/s>] [-m <file>] [-t <file>][/cyan] - Retry failed downloads whose backoff has expired (-a: all now)")
+    console.print("  [cyan]work <queue_file> [-o <output_dir>] [-w <number>] [-pw <number>] [-it <seconds>] [-st <seconds>] "
+                  "[-bw <MB/s>] [-m <file>] [-t <file>][/cyan] - Download items from a job queue shared with other processes or hosts")
+    console.print("  Ctrl+C during a download stops it and keeps partial files, the same command resumes them; "
+                  "press it twice to stop waiting")
     console.print("  [cyan]help[/cyan] - Show this help message")
     console.print("  [cyan]quit[/cyan] - Exit the program\n")
 
+def parse_timeout(value):
+    """Seconds for -it/-st, 0 turns the check off"""
+    try:
+        seconds = float(value)
+        if seconds < 0:
+            raise ValueError("Timeout cannot be negative")
+    except ValueError as e:
+        raise ValueError(f"Invalid timeout: {e}")
+    return seconds or None
+
+def parse_bandwidth(value):
+    """Bytes per second for -bw/-ibw, given in MB/s"""
+    try:
+        rate = float(value)
+        if rate <= 0:
+            raise ValueError("Bandwidth must be positive")
+    except ValueError as e:
+        raise ValueError(f"Invalid bandwidth value: {e}")
+    return rate * 1024 * 1024
+
 def parse_options(args):
     """Parse command options"""
     options = {
         'url': None,
         'limit': None,
         'reverse': False,
+        'order': ORDER_PLAYLIST,
         'bitrate': '192',
+        'audio_policy': 'mp3',
         'download_video': False,
         'keep_video': True,
         'convert_to_audio': False,
         'output_dir': 'output',
         'playlist_name': None,
-        'songs_only': False
+        'songs_only': False,
+        'resolve_workers': 8,
+        'use_cache': True,
+        'reuse_listing': False,
+        'use_archive': True,
+        'postprocess_workers': None,
+        'fused_postprocess': True,
+        'stream': True,
+        'segment_connections': 1,
+        'segment_size': 8,
+        'min_workers': 2,
+        'max_workers': 8,
+        'bandwidth': None,
+        'item_bandwidth': None,
+        'item_timeout': None,
+        'stall_timeout': DEFAULT_STALL_TIMEOUT,
+        'metrics_file': None,
+        'trace_file': None,
+        'queue_file': None
     }
     
     i = 1
@@ -113,6 +192,11 @@ def parse_options(args):
                 raise ValueError(f"Invalid limit value: {e}")
         elif args[i] == '-r':
             options['reverse'] = True
+        elif args[i] == '-ord' and i + 1 < len(args):
+            if args[i + 1] not in ORDER_POLICIES:
+                raise ValueError(f"Invalid download order: must be one of {', '.join(ORDER_POLICIES)}")
+            options['order'] = args[i + 1]
+            i += 1
         elif args[i] == '-b' and i + 1 < len(args):
             try:
                 bitrate = args[i + 1]
@@ -122,6 +206,11 @@ def parse_options(args):
                 i += 1
             except ValueError as e:
                 raise ValueError(f"Invalid bitrate value: {e}")
+        elif args[i] == '-af' and i + 1 < len(args):
+            if args[i + 1] not in AUDIO_POLICIES:
+                raise ValueError(f"Invalid audio format policy: must be one of {', '.join(AUDIO_POLICIES)}")
+            options['audio_policy'] = args[i + 1]
+            i += 1
         elif args[i] == '-v':
             options['download_video'] = True
         elif args[i] == '-ka':
@@ -141,13 +230,205 @@ def parse_options(args):
             i += 1
         elif args[i] == '-so':
             options['songs_only'] = True
+        elif args[i] == '-rw' and i + 1 < len(args):
+            try:
+                resolve_workers = int(args[i + 1])
+                if resolve_workers <= 0:
+                    raise ValueError("Resolver count must be positive")
+                options['resolve_workers'] = resolve_workers
+                i += 1
+            except ValueError as e:
+                raise ValueError(f"Invalid resolver count: {e}")
+        elif args[i] in ('-w', '-wmin', '-wmax') and i + 1 < len(args):
+            try:
+                workers = int(args[i + 1])
+                if workers <= 0:
+                    raise ValueError("Worker count must be positive")
+                if args[i] in ('-w', '-wmin'):
+                    options['min_workers'] = workers
+                if args[i] in ('-w', '-wmax'):
+                    options['max_workers'] = workers
+                i += 1
+            except ValueError as e:
+                raise ValueError(f"Invalid download worker count: {e}")
+        elif args[i] == '-pw' and i + 1 < len(args):
+            try:
+                postprocess_workers = int(args[i + 1])
+                if postprocess_workers <= 0:
+                    raise ValueError("Worker count must be positive")
+                options['postprocess_workers'] = postprocess_workers
+                i += 1
+            except ValueError as e:
+                raise ValueError(f"Invalid post-processing worker count: {e}")
+        elif args[i] == '-sc' and i + 1 < len(args):
+            try:
+                connections = int(args[i + 1])
+                if connections <= 0:
+                    raise ValueError("Connection count must be positive")
+                options['segment_connections'] = connections
+                i += 1
+            except ValueError as e:
+                raise ValueError(f"Invalid connection count: {e}")
+        elif args[i] == '-ss' and i + 1 < len(args):
+            try:
+                segment_size = int(args[i + 1])
+                if segment_size <= 0:
+                    raise ValueError("Segment size must be positive")
+                options['segment_size'] = segment_size
+                i += 1
+            except ValueError as e:
+                raise ValueError(f"Invalid segment size: {e}")
+        elif args[i] in ('-bw', '-ibw') and i + 1 < len(args):
+            options['bandwidth' if args[i] == '-bw' else 'item_bandwidth'] = parse_bandwidth(args[i + 1])
+            i += 1
+        elif args[i] in ('-it', '-st') and i + 1 < len(args):
+            options['item_timeout' if args[i] == '-it' else 'stall_timeout'] = parse_timeout(args[i + 1])
+            i += 1
+        elif args[i] == '-m' and i + 1 < len(args):
+            options['metrics_file'] = args[i + 1]
+            i += 1
+        elif args[i] == '-t' and i + 1 < len(args):
+            options['trace_file'] = args[i + 1]
+            i += 1
+        elif args[i] == '-q' and i + 1 < len(args):
+            options['queue_file'] = args[i + 1]
+            i += 1
+        elif args[i] == '-nc':
+            options['use_cache'] = False
+        elif args[i] == '-rl':
+            options['reuse_listing'] = True
+        elif args[i] == '-na':
+            options['use_archive'] = False
+        elif args[i] == '-ns':
+            options['stream'] = False
+        elif args[i] == '-sp':
+            options['fused_postprocess'] = False
         i += 1
     
     if not options['url']:
         raise ValueError("No URL provided")
+    if options['min_workers'] > options['max_workers']:
+        raise ValueError("Minimum download workers cannot exceed the maximum")
     
     return options
 
+def parse_retry_options(args):
+    """Parse retry command options"""
+    options = {
+        'output_dir': 'output',
+        'ignore_backoff': False,
+        'bandwidth': None,
+        'metrics_file': None,
+        'trace_file': None
+    }
+
+    i = 1
+    while i < len(args):
+        if args[i] == '-a':
+            options['ignore_backoff'] = True
+        elif args[i] == '-bw' and i + 1 < len(args):
+            options['bandwidth'] = parse_bandwidth(args[i + 1])
+            i += 1
+        elif args[i] == '-m' and i + 1 < len(args):
+            options['metrics_file'] = args[i + 1]
+            i += 1
+        elif args[i] == '-t' and i + 1 < len(args):
+            options['trace_file'] = args[i + 1]
+            i += 1
+        elif args[i] == '-o' and i + 1 < len(args):
+            path_parts = []
+            j = i + 1
+            while j < len(args) and not args[j].startswith('-'):
+                path_parts.append(args[j])
+                j += 1
+            options['output_dir'] = ' '.join(path_parts)
+            i = j - 1
+        else:
+            raise ValueError(f"Unknown retry option: {args[i]}")
+        i += 1
+
+    return options
+
+def parse_work_options(args):
+    """Parse work command options"""
+    options = {
+        'queue_file': None,
+        'output_dir': 'output',
+        'min_workers': 2,
+        'max_workers': 8,
+        'postprocess_workers': None,
+        'item_timeout': None,
+        'stall_timeout': DEFAULT_STALL_TIMEOUT,
+        'bandwidth': None,
+        'metrics_file': None,
+        'trace_file': None
+    }
+
+    i = 1
+    while i < len(args):
+        if i == 1:
+            options['queue_file'] = args[i]
+        elif args[i] in ('-w', '-pw') and i + 1 < len(args):
+            try:
+                workers = int(args[i + 1])
+                if workers <= 0:
+                    raise ValueError("Worker count must be positive")
+                if args[i] == '-w':
+                    options['min_workers'] = options['max_workers'] = workers
+                else:
+                    options['postprocess_workers'] = workers
+                i += 1
+            except ValueError as e:
+                raise ValueError(f"Invalid worker count: {e}")
+        elif args[i] in ('-it', '-st') and i + 1 < len(args):
+            options['item_timeout' if args[i] == '-it' else 'stall_timeout'] = parse_timeout(args[i + 1])
+            i += 1
+        elif args[i] == '-bw' and i + 1 < len(args):
+            options['bandwidth'] = parse_bandwidth(args[i + 1])
+            i += 1
+        elif args[i] == '-m' and i + 1 < len(args):
+            options['metrics_file'] = args[i + 1]
+            i += 1
+        elif args[i] == '-t' and i + 1 < len(args):
+            options['trace_file'] = args[i + 1]
+            i += 1
+        elif args[i] == '-o' and i + 1 < len(args):
+            path_parts = []
+            j = i + 1
+            while j < len(args) and not args[j].startswith('-'):
+                path_parts.append(args[j])
+                j += 1
+            options['output_dir'] = ' '.join(path_parts)
+            i = j - 1
+        else:
+            raise ValueError(f"Unknown work option: {args[i]}")
+        i += 1
+
+    if not options['queue_file']:
+        raise ValueError("No job queue file provided")
+    return options
+
+def export_metrics(path):
+    """Write the metrics collected so far, Prometheus text unless the path ends in .json"""
+    if not path:
+        return
+    try:
+        metrics.write(path)
+        console.print(f"[dim]Metrics written to {path}")
+    except Exception as e:
+        console.print(f"[yellow]Warning: Could not write metrics to {path}: {str(e)}")
+
+def export_trace(path):
+    """Stop tracing and write the spans recorded for this command"""
+    if not path:
+        return
+    tracer.stop()
+    try:
+        count = tracer.write(path)
+        console.print(f"[dim]Trace with {count} spans written to {path}")
+    except Exception as e:
+        console.print(f"[yellow]Warning: Could not write trace to {path}: {str(e)}")
+
 def main():
     # Check for FFmpeg before starting
     if not check_ffmpeg():
@@ -169,14 +450,77 @@ def main():
                 break
             elif command[0] == "help":
                 display_help()
+            elif command[0] == "retry":
+                try:
+                    options = parse_retry_options(command)
+                    if options['trace_file']:
+                        tracer.start()
+                    downloader = YouTubeDownloader(output_dir=options['output_dir'])
+                    # The limiter outlives commands, so each one sets its own rate
+                    shared_limiter.set_rate(options['bandwidth'])
+                    downloader.retry_failed(ignore_backoff=options['ignore_backoff'])
+                    export_metrics(options['metrics_file'])
+                    export_trace(options['trace_file'])
+                except ValueError as e:
+                    console.print(f"[red]Error: {str(e)}")
+                except KeyboardInterrupt:
+                    console.print(DOWNLOAD_CANCELLED)
+                except Exception as e:
+                    console.print(f"[red]Error processing request: {str(e)}")
+            elif command[0] == "work":
+                try:
+                    options = parse_work_options(command)
+                    if options['trace_file']:
+                        tracer.start()
+                    downloader = YouTubeDownloader(
+                        output_dir=options['output_dir'],
+                        max_workers=options['max_workers'],
+                        min_workers=options['min_workers'],
+                        postprocess_workers=options['postprocess_workers'],
+                        item_timeout=options['item_timeout'],
+                        stall_timeout=options['stall_timeout']
+                    )
+                    shared_limiter.set_rate(options['bandwidth'])
+                    # Only the queue commands need it, so it stays out of startup
+                    from job_queue import JobQueue
+                    with JobQueue(options['queue_file']) as job_queue:
+                        downloader.work_queue(job_queue)
+                    export_metrics(options['metrics_file'])
+                    export_trace(options['trace_file'])
+                except ValueError as e:
+                    console.print(f"[red]Error: {str(e)}")
+                except KeyboardInterrupt:
+                    console.print(DOWNLOAD_CANCELLED)
+                except Exception as e:
+                    console.print(f"[red]Error processing request: {str(e)}")
             elif command[0] in ["dl", "pl", "apl"]:
+                cache = None
+                options = {}
                 try:
                     options = parse_options(command)
-                    downloader = YouTubeDownloader(output_dir=options['output_dir'])
+                    if options['trace_file']:
+                        tracer.start()
+                    downloader = YouTubeDownloader(
+                        output_dir=options['output_dir'],
+                        max_workers=options['max_workers'],
+                        min_workers=options['min_workers'],
+                        postprocess_workers=options['postprocess_workers'],
+                        use_archive=options['use_archive'],
+                        segment_connections=options['segment_connections'],
+                        segment_size=options['segment_size'] * 1024 * 1024,
+                        item_rate_limit=options['item_bandwidth'],
+                        fused_postprocess=options['fused_postprocess'],
+                        item_timeout=options['item_timeout'],
+                        stall_timeout=options['stall_timeout']
+                    )
+                    shared_limiter.set_rate(options['bandwidth'])
+                    if options['use_cache']:
+                        cache = MetadataCache(os.path.join(downloader.state_dir, "metadata.sqlite3"))
 
                     # Process and validate the URL first
                     console.print("[cyan]Processing URL...[/cyan]")
-                    processed_url, is_playlist = process_url(options['url'])
+                    with tracer.span("process_url", "url"):
+                        processed_url, is_playlist = process_url(options['url'])
                     
                     # Validate command matches URL type
                     if command[0] == "dl" and is_playlist:
@@ -192,29 +536,80 @@ def main():
                     if command[0] == "dl":
                         # Single video/audio download
                         console.print("[cyan]Fetching video information...[/cyan]")
-                        media = get_single_video_info(options['url'])
+                        media = get_single_video_info(options['url'], cache=cache)
                         if media:
                             downloader.download_media(
                                 media,
                                 download_video=options['download_video'],
                                 keep_video=options['keep_video'],
                                 convert_to_audio=options['convert_to_audio'],
-                                bitrate=options['bitrate']
+                                bitrate=options['bitrate'],
+                                audio_policy=options['audio_policy']
                             )
                             console.print("[green]Download complete!")
                     else:  # pl or apl
                         # Playlist download
                         console.print("[cyan]Fetching playlist...[/cyan]")
-                        media_items = get_playlist_media(
-                            options['url'],
+                        playlist_options = dict(
                             playlist_name=options['playlist_name'],
                             reverse=options['reverse'],
                             limit=options['limit'],
-                            songs_only=options['songs_only']
+                            songs_only=options['songs_only'],
+                            resolve_workers=options['resolve_workers'],
+                            cache=cache,
+                            archive=downloader.archive,
+                            media_format=media_format(
+                                options['download_video'], options['convert_to_audio'], options['audio_policy']
+                            ),
+                            bitrate=options['bitrate'],
+                            manifest_dir=os.path.join(downloader.state_dir, "manifests"),
+                            # Listed again by default, so items added to the playlist since the last run are found
+                            manifest_ttl=DEFAULT_MANIFEST_TTL if options['reuse_listing'] else 0
                         )
+                        # Kept for the next run to resume over the same items unless the download finishes
+                        manifest = PlaylistManifest(manifest_path(playlist_options['manifest_dir'], options['url']))
+                        download_options = dict(
+                            download_video=options['download_video'],
+                            keep_video=options['keep_video'],
+                            convert_to_audio=options['convert_to_audio'],
+                            bitrate=options['bitrate'],
+                            audio_policy=options['audio_policy']
+                        )
+
+                        if options['queue_file']:
+                            # Other processes and hosts can join with 'work <queue_file>' while this one works on it
+                            from job_queue import JobQueue
+                            with JobQueue(options['queue_file']) as job_queue:
+                                # Queue position is claim order, so the schedule is fixed when the items are added
+                                added = job_queue.add(
+                                    order_media(
+                                        get_playlist_media(options['url'], **playlist_options),
+                                        options['order'],
+                                        options['download_video']
+                                    ),
+                                    download_options
+                                )
+                                console.print(f"[cyan]Added {added} items to the job queue {options['queue_file']}")
+                                downloader.work_queue(job_queue)
+                            console.print("[green]Download complete!")
+                            continue
+
+                        if command[0] == "apl" and options['stream']:
+                            # No confirmation needed, so downloads start while entries are still resolving
+                            manifest.mark_unfinished()
+                            downloader.download_playlist(
+                                iter_playlist_media(options['url'], **playlist_options),
+                                order=options['order'],
+                                **download_options
+                            )
+                            manifest.mark_finished()
+                            console.print("[green]Download complete!")
+                            continue
+
+                        media_items = get_playlist_media(options['url'], **playlist_options)
                         
                         if not media_items:
-                            console.print("[red]No items found in playlist")
+                            console.print("[red]No items to download from playlist")
                             continue
 
                         if options['limit']:
@@ -229,21 +624,25 @@ def main():
                                 console.print("[cyan]Note: Playlist order is reversed")
 
                         if command[0] == "apl" or Prompt.ask("Do you want to download them?", choices=["y", "n"]) == "y":
-                            downloader.download_playlist(
-                                media_items,
-                                download_video=options['download_video'],
-                                keep_video=options['keep_video'],
-                                convert_to_audio=options['convert_to_audio'],
-                                bitrate=options['bitrate']
-                            )
+                            manifest.mark_unfinished()
+                            downloader.download_playlist(media_items, order=options['order'], **download_options)
+                            manifest.mark_finished()
                             console.print("[green]Download complete!")
 
                 except ValueError as e:
                     console.print(f"[red]Error: {str(e)}")
                     continue
+                except KeyboardInterrupt:
+                    console.print(DOWNLOAD_CANCELLED)
+                    continue
                 except Exception as e:
                     console.print(f"[red]Error processing request: {str(e)}")
                     continue
+                finally:
+                    if cache:
+                        cache.close()
+                    export_metrics(options.get('metrics_file'))
+                    export_trace(options.get('trace_file'))
             else:
                 console.print("[red]Invalid command. Type 'help' for available commands")
 
@@ -253,6 +652,7 @@ def main():
         except Exception as e:
             console.print(f"[red]Error: {str(e)}")
 
+    shared_pool.close()
     console.print("[yellow]Goodbye!")
 
 if __name__ == "__main__":
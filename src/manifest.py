@@ -0,0 +1,136 @@
+import hashlib
+import os
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+from media import Media
+
+# How long -rl reuses a listing; without it playlists are listed again so new items are found
+DEFAULT_MANIFEST_TTL = 60 * 60  # One hour
+# A run cut short reuses its listing for this long, so the next run resumes over the same items
+RESUME_MANIFEST_TTL = 24 * 60 * 60
+RESUME_SUFFIX = ".resume"
+# Songs-only prefilter verdict from the flat listing, kept in front of each record
+VERDICT_FLAGS = {True: 'm', False: 'x', None: '-'}
+FLAG_VERDICTS = {flag: verdict for verdict, flag in VERDICT_FLAGS.items()}
+READ_BLOCK_SIZE = 64 * 1024
+
+def manifest_path(directory: str, url: str) -> str:
+    """Manifest file of a playlist URL inside `directory`"""
+    return os.path.join(directory, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.txt")
+
+def _reversed_lines(f) -> Iterator[bytes]:
+    """Lines of a binary file from the last to the first, reading fixed-size blocks from the end"""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    tail = b''
+    while position > 0:
+        size = min(READ_BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + tail).split(b'\n')
+        # The first piece may be the end of a line that starts in the previous block
+        tail = lines.pop(0)
+        for line in reversed(lines):
+            if line:
+                yield line
+    if tail:
+        yield tail
+
+class PlaylistManifest:
+    """
+    On-disk listing of a playlist: a `#<title>` header, then one `<flag> <record>` line per
+    entry, where record is Media.to_save_format() and flag the songs-only prefilter verdict.
+    Entries are written while the listing is enumerated and read back lazily in either
+    direction, so -n and -r never hold the whole listing in memory. A manifest is only
+    published once its listing was enumerated to the end; one younger than the TTL, or
+    one a download run was cut short on, is reused instead of listing the playlist again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.title: Optional[str] = None
+        self.count = 0
+
+    def age(self) -> Optional[float]:
+        """Seconds since the manifest was written, None if there is none"""
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    @property
+    def resume_path(self) -> str:
+        return self.path + RESUME_SUFFIX
+
+    def mark_unfinished(self):
+        """Record that a download run is working from this listing, until mark_finished"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        open(self.resume_path, "w").close()
+
+    def mark_finished(self):
+        try:
+            os.remove(self.resume_path)
+        except OSError:
+            pass
+
+    def unfinished(self) -> bool:
+        """Whether the last download run working from this listing was cut short"""
+        return os.path.exists(self.resume_path)
+
+    def load(self, ttl: float = DEFAULT_MANIFEST_TTL) -> bool:
+        """Read the header and count the entries of a manifest younger than `ttl`, or left by an unfinished run"""
+        age = self.age()
+        if age is None or (age > ttl and not (self.unfinished() and age <= RESUME_MANIFEST_TTL)):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                header = f.readline()
+                if not header.startswith('#'):
+                    return False
+                self.title = header[1:].rstrip('\r\n')
+                self.count = sum(1 for line in f if line.strip())
+        except (OSError, UnicodeDecodeError):
+            return False
+        return True
+
+    def write(self, title: str, entries: Iterable[Tuple[Media, Optional[bool]]]) -> int:
+        """
+        Stream `(record, verdict)` pairs to disk as they are enumerated
+        Returns: the number of entries written
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.partial"
+        count = 0
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(f"#{title}\n")
+                for record, verdict in entries:
+                    f.write(f"{VERDICT_FLAGS[verdict]} {record.to_save_format()}\n")
+                    count += 1
+            os.replace(temp_path, self.path)
+        except BaseException:
+            # An interrupted listing is never mistaken for a complete one
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.title = title
+        self.count = count
+        return count
+
+    def entries(self, reverse: bool = False, limit: Optional[int] = None) -> Iterator[Tuple[Media, Optional[bool]]]:
+        """Yield `(record, verdict)` pairs in playlist order, or from the end with `reverse`, up to `limit`"""
+        if limit is not None and limit <= 0:
+            return
+        yielded = 0
+        with open(self.path, "rb") as f:
+            lines = _reversed_lines(f) if reverse else f
+            for line in lines:
+                line = line.decode('utf-8').rstrip('\r\n')
+                if not line or line.startswith('#'):
+                    continue
+                yield Media.from_save_format(line[2:]), FLAG_VERDICTS.get(line[0])
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
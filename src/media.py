@@ -0,0 +1,74 @@
+import sys
+from typing import Optional, Union
+
+def parse_duration(duration: Union[int, float, str, None]) -> int:
+    """Whole seconds from a yt-dlp duration or a saved record, 0 when unknown"""
+    try:
+        return max(0, int(float(duration)))
+    except (TypeError, ValueError):
+        return 0
+
+class Media:
+    """
+    A video to download. Slotted, with the duration as an int and the playlist name
+    interned (one string shared by every item of a playlist), so channels with tens
+    of thousands of entries stay small in memory
+    """
+    __slots__ = ('id', 'title', 'duration', 'is_from_metadata', 'playlist_name', 'info', 'video_bytes', 'audio_bytes')
+
+    def __init__(self,
+                 id: str,
+                 title: str,
+                 duration: Union[int, float, str, None] = 0,
+                 is_from_metadata: bool = False,
+                 playlist_name: Optional[str] = None,
+                 info: Optional[dict] = None,
+                 video_bytes: Optional[int] = None,
+                 audio_bytes: Optional[int] = None):
+        self.id = id
+        self.title = title
+        self.duration = parse_duration(duration)
+        self.is_from_metadata = is_from_metadata
+        self.playlist_name = playlist_name
+        # Info dict from metadata resolution, lets the download start without extracting the video again
+        self.info = info
+        # Expected download sizes for size ordering, kept after `info` is dropped from long lists
+        self.video_bytes = video_bytes
+        self.audio_bytes = audio_bytes
+
+    def __setattr__(self, name, value):
+        if name == 'playlist_name' and value is not None:
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+
+    def __repr__(self) -> str:
+        return (f"Media(id={self.id!r}, title={self.title!r}, duration={self.duration!r}, "
+                f"is_from_metadata={self.is_from_metadata!r}, playlist_name={self.playlist_name!r})")
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        # The info dict and sizes are a cache of remote state, not part of the item's identity
+        return (self.id, self.title, self.duration, self.is_from_metadata, self.playlist_name) == \
+               (other.id, other.title, other.duration, other.is_from_metadata, other.playlist_name)
+
+    __hash__ = None
+
+    def to_save_format(self) -> str:
+        """Serialize to a single `id###duration###title###playlist_name` line"""
+        return f"{self.id}###{self.duration}###{self.title}###{self.playlist_name or ''}"
+
+    @classmethod
+    def from_save_format(cls, line: str) -> 'Media':
+        """Load media previously written with to_save_format"""
+        video_id, duration, rest = line.rstrip("\r\n").split("###", 2)
+        # Titles may themselves contain the separator, the playlist name is always last
+        title, _, playlist_name = rest.rpartition("###") if "###" in rest else (rest, "", "")
+        return cls(
+            id=video_id,
+            # Records written before durations were integers hold "213.0" or "None"
+            duration=duration,
+            title=title,
+            is_from_metadata=True,
+            playlist_name=playlist_name or None
+        )
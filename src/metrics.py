@@ -0,0 +1,191 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Seconds, wide enough for a cached lookup up to a long transcode
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def _label_key(labelnames: Sequence[str], labels: dict) -> Tuple[str, ...]:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {list(labelnames)}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    escaped = [value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values]
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, escaped)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    """Monotonic total, optionally split by labels"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def _prometheus(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+    def _snapshot(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [{'labels': dict(zip(self.labelnames, key)), 'value': value} for key, value in values]
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, optionally split by labels"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Per label set: [bucket counts..., overflow count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall time of the block, whether it succeeds or not"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _items(self):
+        with self._lock:
+            return sorted((key, list(counts), total[0]) for key, (counts, total) in self._values.items())
+
+    def _prometheus(self) -> List[str]:
+        lines = []
+        for key, counts, total in self._items():
+            cumulative = 0
+            for bound, count in zip([f"{bound:g}" for bound in self.buckets] + ["+Inf"], counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="' + bound + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def _snapshot(self) -> list:
+        return [
+            {
+                'labels': dict(zip(self.labelnames, key)),
+                'count': sum(counts),
+                'sum': total,
+                'buckets': dict(zip([f"{bound:g}" for bound in self.buckets] + ["+Inf"], counts))
+            }
+            for key, counts, total in self._items()
+        ]
+
+class MetricsRegistry:
+    """Process-wide collection of metrics, exported as Prometheus text or a JSON snapshot"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format, suitable for node_exporter's textfile collector"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric._prometheus())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            'timestamp': time.time(),
+            'metrics': {
+                metric.name: {'type': metric.kind, 'help': metric.help, 'values': metric._snapshot()}
+                for metric in metrics
+            }
+        }
+
+    def write(self, path: str):
+        """Write a JSON snapshot for `.json` paths and Prometheus text otherwise, replacing the file atomically"""
+        if path.lower().endswith(".json"):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.to_prometheus()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+# Shared by every component in the process so one export covers the whole run
+metrics = MetricsRegistry()
+
+DOWNLOAD_BYTES = metrics.counter(
+    "tube_download_bytes_total", "Bytes received from media servers")
+DOWNLOADS = metrics.counter(
+    "tube_downloads_total", "Items downloaded and post-processed successfully")
+DEDUPLICATED = metrics.counter(
+    "tube_deduplicated_total", "Items reused from an identical file elsewhere in the output directory", ("method",))
+AUDIO_OUTPUTS = metrics.counter(
+    "tube_audio_outputs_total", "Audio items by how the final file was produced", ("mode",))
+DOWNLOAD_INFO = metrics.counter(
+    "tube_download_info_total", "Downloads by where their formats came from: reused or extracted again", ("source",))
+DOWNLOAD_ABORTS = metrics.counter(
+    "tube_download_aborts_total", "Downloads stopped by the per-item timeout, stall detection or cancellation", ("reason",))
+FAILURES = metrics.counter(
+    "tube_failures_total", "Failed items by pipeline stage and error class", ("stage", "error_class"))
+RESOLVE_SECONDS = metrics.histogram(
+    "tube_resolve_seconds", "Metadata resolution latency per video", ("source",))
+DOWNLOAD_SECONDS = metrics.histogram(
+    "tube_download_seconds", "Network stage duration per item")
+POSTPROCESS_SECONDS = metrics.histogram(
+    "tube_postprocess_seconds", "Time spent in each post-processor", ("postprocessor",))
@@ -0,0 +1,167 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+from media import Media
+
+ERROR_TRANSIENT = "transient"
+ERROR_PERMANENT = "permanent"
+
+# Failures that will not fix themselves by waiting
+PERMANENT_ERROR_RE = re.compile(
+    r'private video|video unavailable|has been removed|no longer available|account .* terminated'
+    r'|copyright|members-only|join this channel|not available in your country|unsupported url'
+    r'|sign in to confirm your age|inappropriate for some users',
+    re.IGNORECASE
+)
+
+# Scheduled premieres and live events, which become downloadable once they start
+RELEASE_RE = re.compile(r'(?:premieres|will begin) in (\d+) (minute|hour|day|week)s?', re.IGNORECASE)
+RELEASE_UNITS = {'minute': 60, 'hour': 60 * 60, 'day': 24 * 60 * 60, 'week': 7 * 24 * 60 * 60}
+
+def classify_error(error: BaseException) -> str:
+    """Split failures into transient (network, throttling, server errors) and permanent ones"""
+    return ERROR_PERMANENT if PERMANENT_ERROR_RE.search(str(error)) else ERROR_TRANSIENT
+
+def release_delay(error: BaseException) -> Optional[float]:
+    """Seconds until an upcoming premiere or live event starts, when the error announces one"""
+    match = RELEASE_RE.search(str(error))
+    if match is None:
+        return None
+    return int(match.group(1)) * RELEASE_UNITS[match.group(2).lower()]
+
+@dataclass
+class RetryItem:
+    media: Media
+    options: dict
+    error_class: str
+    error: str
+    attempts: int
+    next_attempt_at: float
+
+class RetryQueue:
+    """
+    Durable SQLite queue of failed downloads with the options they were requested with.
+    Transient failures are rescheduled with exponential backoff and jitter, upcoming
+    premieres shortly after they start; permanent ones (private or removed videos)
+    are kept for reporting but never retried.
+    """
+
+    def __init__(self,
+                 path: str,
+                 base_delay: float = 60,
+                 max_delay: float = 6 * 60 * 60,
+                 max_attempts: int = 8):
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS failures (
+                id TEXT NOT NULL,
+                playlist TEXT NOT NULL,
+                format TEXT NOT NULL,
+                record TEXT NOT NULL,
+                options TEXT NOT NULL,
+                error_class TEXT NOT NULL,
+                error TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (id, playlist, format)
+            )
+        """)
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential delay with +/-50% jitter so retries from many items spread out"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    def add(self, media: Media, options: dict, fmt: str, error: BaseException):
+        """Record a failed download, bumping its attempt count if it was already queued"""
+        now = time.time()
+        error_class = classify_error(error)
+        release = release_delay(error)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM failures WHERE id = ? AND playlist = ? AND format = ?",
+                (media.id, media.playlist_name or "", fmt)
+            ).fetchone()
+            attempts = row[0] if row else 0
+            if release is not None:
+                # Waiting for a premiere isn't a failed attempt, retry once it has started
+                delay = release + self._backoff(1)
+            else:
+                attempts += 1
+                delay = self._backoff(attempts)
+                if attempts >= self.max_attempts:
+                    error_class = ERROR_PERMANENT
+            self._conn.execute(
+                "INSERT OR REPLACE INTO failures "
+                "(id, playlist, format, record, options, error_class, error, attempts, next_attempt_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (media.id, media.playlist_name or "", fmt, media.to_save_format(), json.dumps(options),
+                 error_class, str(error), attempts, now + delay, now)
+            )
+
+    def remove(self, media: Media, fmt: str):
+        """Drop an item once it has downloaded successfully"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM failures WHERE id = ? AND playlist = ? AND format = ?",
+                (media.id, media.playlist_name or "", fmt)
+            )
+
+    def due(self, ignore_backoff: bool = False) -> List[RetryItem]:
+        """Transient failures whose backoff has expired, oldest first"""
+        deadline = float('inf') if ignore_backoff else time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record, options, error_class, error, attempts, next_attempt_at FROM failures "
+                "WHERE error_class = ? AND next_attempt_at <= ? ORDER BY next_attempt_at",
+                (ERROR_TRANSIENT, deadline)
+            ).fetchall()
+        return [
+            RetryItem(Media.from_save_format(record), json.loads(options), error_class, error, attempts, next_at)
+            for record, options, error_class, error, attempts, next_at in rows
+        ]
+
+    def counts(self) -> dict:
+        """Number of queued items per error class, plus transient items still backing off"""
+        with self._lock:
+            result = dict(self._conn.execute(
+                "SELECT error_class, COUNT(*) FROM failures GROUP BY error_class"
+            ).fetchall())
+            result['waiting'] = self._conn.execute(
+                "SELECT COUNT(*) FROM failures WHERE error_class = ? AND next_attempt_at > ?",
+                (ERROR_TRANSIENT, time.time())
+            ).fetchone()[0]
+        return result
+
+    def permanent(self) -> List[RetryItem]:
+        """Items that will not be retried, for reporting"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record, options, error_class, error, attempts, next_attempt_at FROM failures "
+                "WHERE error_class = ? ORDER BY updated_at",
+                (ERROR_PERMANENT,)
+            ).fetchall()
+        return [
+            RetryItem(Media.from_save_format(record), json.loads(options), error_class, error, attempts, next_at)
+            for record, options, error_class, error, attempts, next_at in rows
+        ]
@@ -0,0 +1,92 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+from media import Media
+
+ORDER_PLAYLIST = "playlist"
+# Long items start first so none of them is left running alone at the end (shortest total run time)
+ORDER_LONGEST = "longest"
+# Short items start first so finished files show up as early as possible
+ORDER_SHORTEST = "shortest"
+# Largest expected download first, from the sizes yt-dlp reports for the resolved formats
+ORDER_SIZE = "size"
+ORDER_POLICIES = (ORDER_PLAYLIST, ORDER_LONGEST, ORDER_SHORTEST, ORDER_SIZE)
+ORDER_LABELS = {
+    ORDER_PLAYLIST: "playlist order",
+    ORDER_LONGEST: "longest first",
+    ORDER_SHORTEST: "shortest first",
+    ORDER_SIZE: "largest first",
+}
+
+def media_seconds(media: Media) -> Optional[int]:
+    """Duration of an item in seconds, None when unknown"""
+    return media.duration or None
+
+def _format_size(fmt: dict) -> Optional[int]:
+    return fmt.get('filesize') or fmt.get('filesize_approx')
+
+def _total_size(formats: List[dict]) -> Optional[int]:
+    sizes = [_format_size(fmt) for fmt in formats]
+    if not sizes or not all(sizes):
+        return None
+    return int(sum(sizes))
+
+def format_sizes(info: dict) -> Tuple[Optional[int], Optional[int]]:
+    """
+    (video, audio) download sizes of a resolved info dict: the selected video+audio
+    formats, and the best audio-only format. None where yt-dlp reports no size
+    """
+    audio = [
+        fmt for fmt in info.get('formats') or ()
+        if fmt.get('vcodec') == 'none' and fmt.get('acodec') not in (None, 'none')
+    ]
+    best_audio = [max(audio, key=lambda fmt: fmt.get('abr') or fmt.get('tbr') or 0)] if audio else [info]
+    return _total_size(info.get('requested_formats') or [info]), _total_size(best_audio)
+
+def estimated_bytes(media: Media, download_video: bool) -> Optional[int]:
+    """Expected download size recorded with the metadata (see format_sizes)"""
+    return media.video_bytes if download_video else media.audio_bytes
+
+def _size_keys(media_list: List[Media], download_video: bool) -> Dict[int, Optional[float]]:
+    """Estimated bytes per item; items without sizes are estimated from their duration at the playlist's average byte rate"""
+    sizes = {index: estimated_bytes(media, download_video) for index, media in enumerate(media_list)}
+    known_bytes = known_seconds = 0.0
+    for index, size in sizes.items():
+        seconds = media_seconds(media_list[index])
+        if size and seconds:
+            known_bytes += size
+            known_seconds += seconds
+    # Without any size to go by, duration alone gives the same order
+    rate = known_bytes / known_seconds if known_seconds else 1.0
+    keys = {}
+    for index, media in enumerate(media_list):
+        seconds = media_seconds(media)
+        keys[index] = sizes[index] or (seconds * rate if seconds else None)
+    return keys
+
+def order_media(media_list: Iterable[Media], order: str, download_video: bool = False) -> List[Media]:
+    """
+    Reorder playlist items for download. Items with no duration or size to go by keep
+    their playlist order after all the others
+    """
+    media_list = list(media_list)
+    if order == ORDER_PLAYLIST:
+        return media_list
+    if order not in ORDER_POLICIES:
+        raise ValueError(f"Invalid download order: must be one of {', '.join(ORDER_POLICIES)}")
+
+    if order == ORDER_SIZE:
+        keys = _size_keys(media_list, download_video)
+    else:
+        keys = {index: media_seconds(media) for index, media in enumerate(media_list)}
+    known = [index for index in range(len(media_list)) if keys[index] is not None]
+    unknown = [index for index in range(len(media_list)) if keys[index] is None]
+    # sorted() is stable, so equal keys stay in playlist order
+    known.sort(key=lambda index: keys[index], reverse=order != ORDER_SHORTEST)
+    return [media_list[index] for index in known + unknown]
+
+def simulate_makespan(item_seconds: Iterable[float], workers: int) -> float:
+    """Finish time of items started in the given order, each on the first of `workers` slots to free up"""
+    slots = [0.0] * max(1, workers)
+    for seconds in item_seconds:
+        heapq.heappush(slots, heapq.heappop(slots) + seconds)
+    return max(slots)
@@ -0,0 +1,232 @@
+import json
+import os
+import re
+import threading
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+from bandwidth import BandwidthLimiter
+
+DEFAULT_SEGMENT_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+
+class RangeNotSupported(Exception):
+    """The server cannot serve byte ranges for this URL"""
+
+class ProgressHookError(Exception):
+    """The progress hook raised, which stops the whole download instead of retrying the segment"""
+
+@dataclass
+class Segment:
+    index: int
+    start: int
+    end: int  # Inclusive
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start + 1
+
+class SegmentedDownload:
+    """
+    Download a single HTTP resource over several parallel range requests.
+
+    Data is written into `<filename>.segments.part` and completed segments are
+    recorded in `<filename>.segments.json`, so an interrupted download resumes
+    with only the missing segments. The partial file is discarded when the
+    server reports a different size or validator (ETag/Last-Modified).
+    """
+
+    def __init__(self,
+                 url: str,
+                 filename: str,
+                 headers: Optional[Dict[str, str]] = None,
+                 connections: int = 4,
+                 segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 retries: int = DEFAULT_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 progress_hook: Optional[Callable[[dict], None]] = None,
+                 limiters: Sequence[BandwidthLimiter] = ()):
+        self.url = url
+        self.filename = filename
+        self.part_filename = filename + ".segments.part"
+        self.state_filename = filename + ".segments.json"
+        self.headers = dict(headers or {})
+        self.headers['Accept-Encoding'] = 'identity'
+        self.connections = max(1, connections)
+        self.segment_size = max(CHUNK_SIZE, segment_size)
+        self.retries = retries
+        self.timeout = timeout
+        self.progress_hook = progress_hook
+        # Every chunk is charged to each limiter, e.g. the global cap and a per-item cap
+        self.limiters = list(limiters)
+
+        self.total_size = 0
+        # Bytes received per segment index, used for progress reporting
+        self.segment_progress: Dict[int, int] = {}
+        self._done: List[int] = []
+        self._validator = ""
+        self._lock = threading.Lock()
+        # Set on the first failure, the other connections give up at their next chunk or retry
+        self._stop = threading.Event()
+
+    def _request(self, start: int, end: int):
+        # Pulls in http.client and email, only worth it once a multi-connection download starts
+        import urllib.request
+        headers = dict(self.headers, Range=f"bytes={start}-{end}")
+        return urllib.request.urlopen(urllib.request.Request(self.url, headers=headers), timeout=self.timeout)
+
+    def probe(self):
+        """Find the resource size and confirm the server honours range requests"""
+        try:
+            with self._request(0, 0) as response:
+                content_range = response.headers.get('Content-Range', '')
+                match = re.match(r'bytes\s+0-0/(\d+)', content_range)
+                if response.status != 206 or not match:
+                    raise RangeNotSupported(f"Server replied {response.status} without a usable Content-Range")
+                self.total_size = int(match.group(1))
+                if not self.total_size:
+                    raise RangeNotSupported("Server reported an empty resource")
+                self._validator = response.headers.get('ETag') or response.headers.get('Last-Modified') or ""
+        except urllib.error.HTTPError as e:
+            raise RangeNotSupported(f"Range probe failed with HTTP {e.code}")
+
+    def segments(self) -> List[Segment]:
+        return [
+            Segment(index, start, min(start + self.segment_size, self.total_size) - 1)
+            for index, start in enumerate(range(0, self.total_size, self.segment_size))
+        ]
+
+    def _load_state(self):
+        """Resume from a previous attempt if it matches the current resource"""
+        self._done = []
+        try:
+            with open(self.state_filename, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (state.get('total_size') == self.total_size
+                and state.get('segment_size') == self.segment_size
+                and state.get('validator') == self._validator
+                and os.path.exists(self.part_filename)
+                and os.path.getsize(self.part_filename) == self.total_size):
+            self._done = sorted(set(state.get('done', [])))
+
+    def _save_state(self):
+        """Persist completed segments (lock must be held)"""
+        temp_name = self.state_filename + ".tmp"
+        with open(temp_name, "w", encoding="utf-8") as f:
+            json.dump({
+                'total_size': self.total_size,
+                'segment_size': self.segment_size,
+                'validator': self._validator,
+                'done': self._done,
+            }, f)
+        os.replace(temp_name, self.state_filename)
+
+    def _report(self):
+        if not self.progress_hook:
+            return
+        with self._lock:
+            downloaded = sum(self.segment_progress.values())
+            segments_done = len(self._done)
+        try:
+            self.progress_hook({
+                'status': 'downloading',
+                'filename': self.filename,
+                'downloaded_bytes': downloaded,
+                'total_bytes': self.total_size,
+                'segments_done': segments_done,
+                'segments_total': len(self.segment_progress),
+            })
+        except Exception as e:
+            raise ProgressHookError(str(e)) from e
+
+    def _fetch_segment(self, segment: Segment):
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            if self._stop.is_set():
+                return
+            with self._lock:
+                self.segment_progress[segment.index] = 0
+            try:
+                with self._request(segment.start, segment.end) as response, open(self.part_filename, "r+b") as f:
+                    content_range = response.headers.get('Content-Range', '')
+                    if response.status != 206 or not content_range.startswith(f"bytes {segment.start}-"):
+                        raise RangeNotSupported(f"Unexpected response for segment {segment.index}: {content_range}")
+                    f.seek(segment.start)
+                    received = 0
+                    while received < segment.size:
+                        if self._stop.is_set():
+                            return
+                        chunk = response.read(min(CHUNK_SIZE, segment.size - received))
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        received += len(chunk)
+                        for limiter in self.limiters:
+                            limiter.consume(len(chunk))
+                        with self._lock:
+                            self.segment_progress[segment.index] = received
+                        self._report()
+                    if received != segment.size:
+                        raise IOError(f"Segment {segment.index} ended after {received} of {segment.size} bytes")
+
+                with self._lock:
+                    self._done.append(segment.index)
+                    self._save_state()
+                return
+            except (RangeNotSupported, ProgressHookError):
+                raise
+            except Exception as e:
+                last_error = e
+                if attempt < self.retries:
+                    self._stop.wait(min(2 ** attempt, 10))
+        raise IOError(f"Segment {segment.index} failed after {self.retries + 1} attempts: {last_error}")
+
+    def run(self) -> str:
+        """
+        Download the resource, resuming completed segments from a previous run
+        Returns: the final filename
+        Raises: RangeNotSupported when the caller should fall back to a plain download
+        """
+        self.probe()
+        self._load_state()
+
+        if not self._done:
+            with open(self.part_filename, "wb") as f:
+                f.truncate(self.total_size)
+
+        segments = self.segments()
+        done = set(self._done)
+        for segment in segments:
+            self.segment_progress[segment.index] = segment.size if segment.index in done else 0
+        pending = [segment for segment in segments if segment.index not in done]
+
+        self._stop.clear()
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            futures = [executor.submit(self._fetch_segment, segment) for segment in pending]
+            finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = next((future for future in finished if future.exception() is not None), None)
+            if failed is not None:
+                # Segments not started yet are dropped, running ones stop; finished ones stay recorded
+                self._stop.set()
+                for future in futures:
+                    future.cancel()
+                raise failed.exception()
+
+        if os.path.getsize(self.part_filename) != self.total_size or len(self._done) != len(segments):
+            raise IOError("Segmented download is incomplete")
+
+        os.replace(self.part_filename, self.filename)
+        os.remove(self.state_filename)
+        if self.progress_hook:
+            self.progress_hook({
+                'status': 'finished',
+                'filename': self.filename,
+                'downloaded_bytes': self.total_size,
+                'total_bytes': self.total_size,
+            })
+        return self.filename
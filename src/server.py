@@ -0,0 +1,417 @@
+"""
+Headless daemon exposing the downloader as a local HTTP/JSON job API.
+
+Downloaders (with their archive and retry queue), metadata caches, the YoutubeDL
+pool and the resolver threads stay warm between jobs:
+    python src/server.py --port 8765 -o output
+
+    curl -X POST localhost:8765/jobs -d '{"url": "https://www.youtube.com/playlist?list=...", "bitrate": "320"}'
+    curl localhost:8765/jobs/<id>
+    curl -X DELETE localhost:8765/jobs/<id>
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import bottle
+from rich.console import Console
+from downloader import YouTubeDownloader
+from cache import MetadataCache
+from archive import media_format, AUDIO_POLICIES
+from scheduling import ORDER_PLAYLIST, ORDER_POLICIES
+from manifest import PlaylistManifest, DEFAULT_MANIFEST_TTL, manifest_path
+from ydl_pool import YDLPool, shared_pool
+from metrics import metrics
+from watchdog import DEFAULT_STALL_TIMEOUT
+from youtube import get_single_video_info, iter_playlist_media, process_url, validate_url
+
+console = Console()
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+BITRATES = ('128', '192', '256', '320')
+# Fields a submitted job may set, with the same meaning as the command-line options
+JOB_DEFAULTS = {
+    'output_dir': None,
+    # For URLs with both a video and a playlist: True downloads the playlist, False the video
+    'playlist': False,
+    'download_video': False,
+    'keep_video': True,
+    'convert_to_audio': False,
+    'bitrate': '192',
+    'audio_policy': 'mp3',
+    'limit': None,
+    'reverse': False,
+    'order': ORDER_PLAYLIST,
+    'songs_only': False,
+    'playlist_name': None,
+    'use_cache': True,
+    'reuse_listing': False
+}
+
+def parse_job(body: dict) -> dict:
+    """Validate a submitted job and fill in defaults, raising ValueError on bad input"""
+    if not isinstance(body, dict):
+        raise ValueError("The job must be a JSON object")
+    url = body.get('url')
+    if not isinstance(url, str) or not url:
+        raise ValueError("No URL provided")
+    _, _, _, error = validate_url(url)
+    if error:
+        raise ValueError(error)
+    unknown = set(body) - set(JOB_DEFAULTS) - {'url'}
+    if unknown:
+        raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+
+    options = dict(JOB_DEFAULTS, **{key: value for key, value in body.items() if key != 'url'})
+    options['bitrate'] = str(options['bitrate'])
+    if options['bitrate'] not in BITRATES:
+        raise ValueError("Bitrate must be 128, 192, 256, or 320")
+    if options['audio_policy'] not in AUDIO_POLICIES:
+        raise ValueError(f"Invalid audio format policy: must be one of {', '.join(AUDIO_POLICIES)}")
+    if options['order'] not in ORDER_POLICIES:
+        raise ValueError(f"Invalid download order: must be one of {', '.join(ORDER_POLICIES)}")
+    # bool is an int subclass, so true would otherwise pass as a limit of 1
+    if options['limit'] is not None and (
+            not isinstance(options['limit'], int) or isinstance(options['limit'], bool) or options['limit'] <= 0):
+        raise ValueError("Limit must be a positive integer")
+    for key in ('output_dir', 'playlist_name'):
+        if options[key] is not None and (not isinstance(options[key], str) or not options[key].strip()):
+            raise ValueError(f"{key} must be a non-empty string")
+    name = options['playlist_name']
+    # The name becomes a folder inside the output directory and must stay there
+    if name is not None and ('/' in name or '\\' in name or name.strip() in ('.', '..')):
+        raise ValueError("playlist_name cannot contain path separators or be '.' or '..'")
+    for key in ('playlist', 'download_video', 'keep_video', 'convert_to_audio', 'reverse', 'songs_only', 'use_cache',
+                'reuse_listing'):
+        if not isinstance(options[key], bool):
+            raise ValueError(f"{key} must be true or false")
+    return dict(options, url=url)
+
+@dataclass
+class Job:
+    id: str
+    url: str
+    options: dict
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    is_playlist: Optional[bool] = None
+    succeeded: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'url': self.url,
+            'options': self.options,
+            'status': self.status,
+            'cancel_requested': self.cancel.is_set(),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'is_playlist': self.is_playlist,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'error': self.error
+        }
+
+class JobManager:
+    """
+    Runs submitted jobs in order on long-lived downloaders, one per output directory.
+    Cancelling a queued job drops it; a running job stops starting new items and
+    stops the ones downloading, keeping their partial files for the next run.
+    """
+
+    def __init__(self,
+                 output_dir: str = "output",
+                 concurrent_jobs: int = 1,
+                 resolve_workers: int = 8,
+                 min_workers: int = 2,
+                 max_workers: int = 8,
+                 postprocess_workers: Optional[int] = None,
+                 item_timeout: Optional[float] = None,
+                 stall_timeout: Optional[float] = DEFAULT_STALL_TIMEOUT,
+                 history: int = 1000,
+                 pool: YDLPool = shared_pool):
+        self.output_dir = output_dir
+        self.pool = pool
+        self.resolve_workers = resolve_workers
+        self.downloader_options = dict(
+            min_workers=min_workers, max_workers=max_workers, postprocess_workers=postprocess_workers, pool=pool,
+            item_timeout=item_timeout, stall_timeout=stall_timeout,
+            # Jobs running side by side can't each own the terminal's live display
+            live_progress=concurrent_jobs <= 1
+        )
+        self.history = history
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = OrderedDict()
+        self._queue: queue.Queue = queue.Queue()
+        self._downloaders: Dict[str, YouTubeDownloader] = {}
+        self._caches: Dict[str, MetadataCache] = {}
+        self.resolve_executor = ThreadPoolExecutor(max_workers=resolve_workers, thread_name_prefix="resolve")
+        self._runners = [
+            threading.Thread(target=self._run_jobs, name=f"job_{index}", daemon=True)
+            for index in range(max(1, concurrent_jobs))
+        ]
+        for runner in self._runners:
+            runner.start()
+
+    def submit(self, options: dict) -> Job:
+        """Queue a job parsed by parse_job"""
+        options = dict(options)
+        url = options.pop('url')
+        options['output_dir'] = options['output_dir'] or self.output_dir
+        job = Job(id=uuid.uuid4().hex[:12], url=url, options=options)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cancellation; returns None for unknown jobs"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status not in FINISHED_STATUSES:
+                job.cancel.set()
+                if job.status == JOB_QUEUED:
+                    job.status = JOB_CANCELLED
+                    job.finished_at = time.time()
+        return job
+
+    def counts(self) -> dict:
+        """Number of known jobs per status"""
+        with self._lock:
+            result = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING) + FINISHED_STATUSES}
+            for job in self._jobs.values():
+                result[job.status] += 1
+        return result
+
+    def close(self):
+        """Cancel everything, wait for running jobs to wind down and release the warm resources"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            self.cancel(job.id)
+        for _ in self._runners:
+            self._queue.put(None)
+        for runner in self._runners:
+            runner.join()
+        self.resolve_executor.shutdown(cancel_futures=True)
+        for cache in self._caches.values():
+            cache.close()
+        self.pool.close()
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs beyond `history` (lock must be held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    def _downloader(self, output_dir: str) -> YouTubeDownloader:
+        """Warm downloader for an output directory, created on first use"""
+        with self._lock:
+            if output_dir not in self._downloaders:
+                self._downloaders[output_dir] = YouTubeDownloader(output_dir=output_dir, **self.downloader_options)
+            return self._downloaders[output_dir]
+
+    def _cache(self, downloader: YouTubeDownloader) -> MetadataCache:
+        with self._lock:
+            if downloader.output_dir not in self._caches:
+                self._caches[downloader.output_dir] = MetadataCache(
+                    os.path.join(downloader.state_dir, "metadata.sqlite3")
+                )
+            return self._caches[downloader.output_dir]
+
+    def _run_jobs(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != JOB_QUEUED:
+                    continue
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+            try:
+                self._run(job)
+                status, error = (JOB_CANCELLED if job.cancel.is_set() else JOB_DONE), None
+            except Exception as e:
+                console.print(f"[red]Job {job.id} failed: {str(e)}")
+                status, error = JOB_FAILED, str(e)
+            with self._lock:
+                job.status = status
+                job.error = error
+                job.finished_at = time.time()
+
+    def _count(self, job: Job, ok: bool):
+        with self._lock:
+            if ok:
+                job.succeeded += 1
+            else:
+                job.failed += 1
+
+    def _run(self, job: Job):
+        options = job.options
+        downloader = self._downloader(options['output_dir'])
+        cache = self._cache(downloader) if options['use_cache'] else None
+        download_options = dict(
+            download_video=options['download_video'],
+            keep_video=options['keep_video'],
+            convert_to_audio=options['convert_to_audio'],
+            bitrate=options['bitrate'],
+            audio_policy=options['audio_policy']
+        )
+
+        processed_url, job.is_playlist = process_url(job.url, prefer_playlist=options['playlist'])
+        if not job.is_playlist:
+            media = get_single_video_info(processed_url, cache=cache, pool=self.pool)
+            if media is None:
+                raise ValueError("Could not fetch video information")
+            if not job.cancel.is_set():
+                self._count(job, downloader.download_media(media, cancel=job.cancel, **download_options))
+            return
+
+        media_items = iter_playlist_media(
+            processed_url,
+            playlist_name=options['playlist_name'],
+            reverse=options['reverse'],
+            limit=options['limit'],
+            songs_only=options['songs_only'],
+            resolve_workers=self.resolve_workers,
+            cache=cache,
+            archive=downloader.archive,
+            media_format=media_format(
+                options['download_video'], options['convert_to_audio'], options['audio_policy']
+            ),
+            bitrate=options['bitrate'],
+            pool=self.pool,
+            executor=self.resolve_executor,
+            manifest_dir=os.path.join(downloader.state_dir, "manifests"),
+            manifest_ttl=DEFAULT_MANIFEST_TTL if options['reuse_listing'] else 0,
+            raise_errors=True
+        )
+        # A cancelled job leaves its listing for the next one to resume over the same items
+        manifest = PlaylistManifest(manifest_path(os.path.join(downloader.state_dir, "manifests"), processed_url))
+        manifest.mark_unfinished()
+        downloader.download_playlist(
+            media_items,
+            on_done=lambda media, ok: self._count(job, ok),
+            cancel=job.cancel,
+            order=options['order'],
+            **download_options
+        )
+        if not job.cancel.is_set():
+            manifest.mark_finished()
+
+def _error(status: int, message: str) -> dict:
+    bottle.response.status = status
+    return {'error': message}
+
+def create_app(manager: JobManager) -> bottle.Bottle:
+    """HTTP/JSON routes over a JobManager"""
+    app = bottle.Bottle()
+
+    @app.post('/jobs')
+    def submit_job():
+        try:
+            body = json.loads(bottle.request.body.read() or b'null')
+            job = manager.submit(parse_job(body))
+        except ValueError as e:
+            return _error(400, str(e))
+        bottle.response.status = 201
+        bottle.response.set_header('Location', f"/jobs/{job.id}")
+        return job.to_dict()
+
+    @app.get('/jobs')
+    def list_jobs():
+        return {'jobs': [job.to_dict() for job in manager.jobs()]}
+
+    @app.get('/jobs/<job_id>')
+    def get_job(job_id):
+        job = manager.get(job_id)
+        return job.to_dict() if job else _error(404, "No such job")
+
+    @app.delete('/jobs/<job_id>')
+    def cancel_job(job_id):
+        job = manager.cancel(job_id)
+        return job.to_dict() if job else _error(404, "No such job")
+
+    @app.get('/health')
+    def health():
+        return {'status': 'ok', 'jobs': manager.counts()}
+
+    @app.get('/metrics')
+    def export_metrics():
+        bottle.response.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        return metrics.to_prometheus()
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-o", "--output-dir", default="output", help="Default output directory for jobs")
+    parser.add_argument("--jobs", type=int, default=1, help="Jobs run at the same time")
+    parser.add_argument("-rw", "--resolve-workers", type=int, default=8)
+    parser.add_argument("-wmin", "--min-workers", type=int, default=2)
+    parser.add_argument("-wmax", "--max-workers", type=int, default=8)
+    parser.add_argument("-pw", "--postprocess-workers", type=int, default=None)
+    parser.add_argument("-it", "--item-timeout", type=float, default=None,
+                        help="Stop and re-queue a download that takes longer (seconds)")
+    parser.add_argument("-st", "--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT,
+                        help="Stop and re-queue a download without progress for this long (seconds, 0 disables)")
+    args = parser.parse_args()
+
+    from main import check_ffmpeg, display_ffmpeg_instructions
+    if not check_ffmpeg():
+        display_ffmpeg_instructions()
+        sys.exit(1)
+
+    manager = JobManager(
+        output_dir=args.output_dir,
+        concurrent_jobs=args.jobs,
+        resolve_workers=args.resolve_workers,
+        min_workers=min(args.min_workers, args.max_workers),
+        max_workers=args.max_workers,
+        postprocess_workers=args.postprocess_workers,
+        item_timeout=args.item_timeout or None,
+        stall_timeout=args.stall_timeout or None
+    )
+    console.print(f"[bold green]Tube Media Downloader[/bold green] serving on http://{args.host}:{args.port}")
+    try:
+        bottle.run(create_app(manager), host=args.host, port=args.port, quiet=True)
+    finally:
+        console.print("[yellow]Shutting down, stopping running downloads...")
+        manager.close()
+
+if __name__ == "__main__":
+    main()
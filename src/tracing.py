@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+class Tracer:
+    """
+    Opt-in recorder of timed spans per worker thread, written as a Chrome trace
+    (load in chrome://tracing or https://ui.perfetto.dev) or as JSON lines.
+    While disabled, spans cost one attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._events: List[dict] = []
+        self._threads = {}
+        self._origin = time.perf_counter()
+
+    def start(self):
+        """Discard earlier spans and start recording"""
+        with self._lock:
+            self._events = []
+            self._threads = {}
+            self._origin = time.perf_counter()
+            self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def record(self, name: str, start: float, end: float, category: str = "", **args):
+        """Add a span from two time.perf_counter() readings taken on the current thread"""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self._origin) * 1e6, 1),
+            'dur': round((end - start) * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': thread.ident,
+            'args': args
+        }
+        with self._lock:
+            self._events.append(event)
+            self._threads[thread.ident] = thread.name
+
+    @contextmanager
+    def span(self, name: str, category: str = "", **args) -> Iterator[None]:
+        """Time the block as one span, tagged with `args` (e.g. video_id)"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), category, **args)
+
+    def write(self, path: str) -> int:
+        """Write recorded spans, JSON lines for `.jsonl` paths and a Chrome trace otherwise; returns the span count"""
+        with self._lock:
+            events = sorted(self._events, key=lambda event: event['ts'])
+            threads = dict(self._threads)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            if path.lower().endswith(".jsonl"):
+                for event in events:
+                    line = dict(event, thread=threads.get(event['tid']))
+                    f.write(json.dumps(line, separators=(',', ':')) + "\n")
+            else:
+                # Metadata events label each row of the timeline with the worker's thread name
+                names = [
+                    {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                    for tid, name in threads.items()
+                ]
+                json.dump({'traceEvents': names + events, 'displayTimeUnit': 'ms'}, f)
+        os.replace(temp_path, path)
+        return len(events)
+
+# Shared by every component in the process so one trace shows the whole pipeline
+tracer = Tracer()
@@ -0,0 +1,55 @@
+import threading
+import time
+from typing import Optional
+
+ABORT_TIMEOUT = "timeout"
+ABORT_STALLED = "stalled"
+ABORT_CANCELLED = "cancelled"
+# Seconds without progress before a download counts as stalled
+DEFAULT_STALL_TIMEOUT = 60.0
+# Less than this many bytes within the stall timeout is no progress, so a trickling connection stalls too
+STALL_MIN_BYTES = 64 * 1024
+
+class ItemWatch:
+    """
+    Wall-clock limit, stall detection and cancellation for one download attempt.
+    Checked from the download's progress hook, which aborts the download when a
+    reason is returned; a connection that delivers nothing at all is bounded by
+    the socket timeout instead, since no hook runs while it waits
+    """
+
+    def __init__(self,
+                 item_timeout: Optional[float] = None,
+                 stall_timeout: Optional[float] = DEFAULT_STALL_TIMEOUT,
+                 cancel: Optional[threading.Event] = None):
+        self.item_timeout = item_timeout
+        self.stall_timeout = stall_timeout
+        self.cancel = cancel
+        self.started = self.progress_at = time.monotonic()
+        self.progress_bytes = 0
+        self.reason: Optional[str] = None
+
+    def check(self, downloaded: int) -> Optional[str]:
+        """Record `downloaded` bytes so far; returns why the download has to stop, None to carry on"""
+        if self.reason:
+            return self.reason
+        now = time.monotonic()
+        if downloaded - self.progress_bytes >= STALL_MIN_BYTES:
+            self.progress_bytes = downloaded
+            self.progress_at = now
+
+        if self.cancel is not None and self.cancel.is_set():
+            self.reason = ABORT_CANCELLED
+        elif self.item_timeout and now - self.started > self.item_timeout:
+            self.reason = ABORT_TIMEOUT
+        elif self.stall_timeout and now - self.progress_at > self.stall_timeout:
+            self.reason = ABORT_STALLED
+        return self.reason
+
+    def describe(self) -> str:
+        """Why the download was stopped, for messages"""
+        if self.reason == ABORT_TIMEOUT:
+            return f"took longer than {self.item_timeout:g}s"
+        if self.reason == ABORT_STALLED:
+            return f"made no progress for {self.stall_timeout:g}s"
+        return "cancelled"
@@ -0,0 +1,104 @@
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import yt_dlp
+
+# Options that change from item to item and are applied at checkout time
+PER_ITEM_OPTIONS = ('outtmpl',)
+
+def create_youtube_dl(opts: dict) -> 'yt_dlp.YoutubeDL':
+    """Default factory; yt-dlp is imported on first use since it dominates startup time"""
+    import yt_dlp
+    return yt_dlp.YoutubeDL(opts)
+
+class YDLPool:
+    """
+    Pool of long-lived YoutubeDL instances shared by worker threads.
+    Instances are grouped by their option profile (everything except the
+    per-item options), checked out by one worker at a time and returned for
+    reuse, so extractor setup, cookie jars and HTTP connections are kept warm.
+    """
+
+    def __init__(self,
+                 max_idle: int = 16,
+                 factory: Callable[[dict], 'yt_dlp.YoutubeDL'] = create_youtube_dl):
+        self.max_idle = max_idle
+        # Builds new instances, swapped out to register extra extractors (see benchmarks/)
+        self.factory = factory
+        self.created = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List['yt_dlp.YoutubeDL']] = defaultdict(list)
+        self._closed = False
+
+    @staticmethod
+    def _profile(opts: dict) -> str:
+        """Key identifying instances that can serve the given options"""
+        shared = {key: value for key, value in opts.items() if key not in PER_ITEM_OPTIONS}
+        return json.dumps(shared, sort_keys=True, default=repr)
+
+    @contextmanager
+    def acquire(self,
+                opts: dict,
+                progress_hooks: Sequence[Callable[[dict], None]] = (),
+                postprocessor_hooks: Sequence[Callable[[dict], None]] = ()) -> Iterator['yt_dlp.YoutubeDL']:
+        """
+        Check out a YoutubeDL configured with `opts` for the duration of the block
+        `progress_hooks` and `postprocessor_hooks` are attached for this checkout only
+        """
+        profile = self._profile(opts)
+        ydl: Optional['yt_dlp.YoutubeDL'] = None
+
+        with self._lock:
+            if self._idle[profile]:
+                ydl = self._idle[profile].pop()
+                self.reused += 1
+            else:
+                self.created += 1
+
+        if ydl is None:
+            ydl = self.factory(dict(opts))
+
+        if 'outtmpl' in opts:
+            ydl.params['outtmpl']['default'] = opts['outtmpl']
+        for hook in progress_hooks:
+            ydl.add_progress_hook(hook)
+        for hook in postprocessor_hooks:
+            ydl.add_postprocessor_hook(hook)
+
+        try:
+            yield ydl
+        finally:
+            # yt-dlp has no public way to detach a hook
+            for hook in progress_hooks:
+                ydl._progress_hooks.remove(hook)
+            for hook in postprocessor_hooks:
+                ydl._postprocessor_hooks.remove(hook)
+                # Each post-processor keeps its own copy of the hook list
+                for pps in ydl._pps.values():
+                    for pp in pps:
+                        if hook in pp._progress_hooks:
+                            pp._progress_hooks.remove(hook)
+            # Extraction errors leave the instance usable, so it is returned either way
+            with self._lock:
+                keep = not self._closed and len(self._idle[profile]) < self.max_idle
+                if keep:
+                    self._idle[profile].append(ydl)
+            if not keep:
+                ydl.close()
+
+    def close(self):
+        """Close every idle instance and stop pooling new ones"""
+        with self._lock:
+            self._closed = True
+            idle = [ydl for instances in self._idle.values() for ydl in instances]
+            self._idle.clear()
+        for ydl in idle:
+            ydl.close()
+
+# Shared by metadata resolution and downloads unless a caller supplies its own pool
+shared_pool = YDLPool()
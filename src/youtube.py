@@ -1,14 +1,34 @@
-import yt_dlp
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager, nullcontext
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.prompt import Confirm
 from urllib.parse import urlparse, parse_qs
 from downloader import Media
+from cache import MetadataCache
+from archive import DownloadArchive, STATUS_DONE, STATUS_CHANGED
+from ydl_pool import YDLPool, shared_pool
+from metrics import RESOLVE_SECONDS
+from tracing import tracer
+from manifest import PlaylistManifest, manifest_path
+from scheduling import format_sizes
 
 console = Console()
 
+# Parts of a resolved info dict the download stage never reads, automatic captions
+# alone carry a URL per caption format and translation language
+UNUSED_INFO_KEYS = ('automatic_captions', 'subtitles', 'heatmap')
+# Resolved info dicts are only kept for this many items of a list, their URLs expire within hours
+MAX_STORED_INFO_ITEMS = 500
+# Entries submitted for resolution ahead of the results read, per resolve worker
+RESOLVE_AHEAD = 4
+# Channel URLs resolve to a tab before listing anything
+MAX_LIST_REDIRECTS = 3
+
 def sanitize_filename(filename: str) -> str:
     """Remove invalid characters from filename"""
     # Remove or replace invalid characters
@@ -17,34 +37,32 @@ def sanitize_filename(filename: str) -> str:
     filename = filename.strip('. ')
     return filename
 
+# Suffixes removed from titles, compiled into one alternation so a title is scanned once
+TITLE_NOISE_RE = re.compile('|'.join([
+    r'\(Official Video\)',
+    r'\(Official Music Video\)',
+    r'\[Official Video\]',
+    r'\[Official Music Video\]',
+    r'\(Lyrics\)',
+    r'\[Lyrics\]',
+    r'\(Audio\)',
+    r'\[Audio\]',
+    r'\(Official Audio\)',
+    r'\[Official Audio\]',
+    r'Official Video',
+    r'Official Music Video',
+    r'Music Video',
+    r'HD',
+    r'HQ',
+    r'4K',
+    r'\d{4}',  # Year
+    r'\(\d+\)', # Year in parentheses
+    r'\[\d+\]'  # Year in brackets
+]), re.IGNORECASE)
+
 def clean_title(title: str) -> str:
     """Clean up video title by removing common patterns"""
-    patterns = [
-        r'\(Official Video\)',
-        r'\(Official Music Video\)',
-        r'\[Official Video\]',
-        r'\[Official Music Video\]',
-        r'\(Lyrics\)',
-        r'\[Lyrics\]',
-        r'\(Audio\)',
-        r'\[Audio\]',
-        r'\(Official Audio\)',
-        r'\[Official Audio\]',
-        r'Official Video',
-        r'Official Music Video',
-        r'Music Video',
-        r'HD',
-        r'HQ',
-        r'4K',
-        r'\d{4}',  # Year
-        r'\(\d+\)', # Year in parentheses
-        r'\[\d+\]'  # Year in brackets
-    ]
-    
-    for pattern in patterns:
-        title = re.sub(pattern, '', title, flags=re.IGNORECASE)
-    
-    return title.strip()
+    return TITLE_NOISE_RE.sub('', title).strip()
 
 def extract_playlist_id(url: str) -> Optional[str]:
     """Extract playlist ID from various playlist URL formats"""
@@ -66,35 +84,78 @@ def extract_playlist_id(url: str) -> Optional[str]:
         
     return playlist_id
 
+# Music-related keywords
+MUSIC_KEYWORDS = (
+    'official music video', 'official video', 'official audio',
+    'lyrics', 'music video', 'ft.', 'feat.', 'remix',
+    'official lyric video', 'audio', 'album', 'single'
+)
+MUSIC_KEYWORD_RE = re.compile('|'.join(re.escape(keyword) for keyword in MUSIC_KEYWORDS))
+MUSIC_KEYWORD_SET = frozenset(MUSIC_KEYWORDS)
+YEAR_RE = re.compile(r'(\d{4}|\d{2})')
+# Titles of content that is almost never a song
+NON_MUSIC_RE = re.compile(
+    r'\b(podcast|episode \d+|ep\.? ?\d+|vlog|tutorial|how to|review|unboxing|react(s|ing|ion) to|'
+    r'first time hearing|gameplay|walkthrough|let\'s play|trailer|interview|livestream|q ?& ?a|documentary)\b'
+)
+# Uploaders that only publish music: auto-generated artist channels and VEVO
+MUSIC_CHANNEL_RE = re.compile(r'( - topic$|vevo$)')
+# Flat entries longer than this range (seconds) are streams or podcasts unless the title says otherwise; shorter
+# ones are only rejected together with a non-music title, since plenty of real tracks are under a minute
+MUSIC_DURATION_RANGE = (60, 30 * 60)
+
 def is_likely_music(video_info: dict) -> bool:
     """
     Determine if a video is likely to be music based on various factors
     """
     # Get the necessary information
-    title = video_info.get('title', '').lower()
-    description = video_info.get('description', '').lower()
-    categories = video_info.get('categories', [])
-    tags = [tag.lower() for tag in video_info.get('tags', [])]
-    
-    # Music-related keywords
-    music_keywords = {
-        'official music video', 'official video', 'official audio',
-        'lyrics', 'music video', 'ft.', 'feat.', 'remix',
-        'official lyric video', 'audio', 'album', 'single'
-    }
+    title = (video_info.get('title') or '').lower()
+    description = (video_info.get('description') or '').lower()
+    categories = video_info.get('categories') or []
+    tags = [tag.lower() for tag in video_info.get('tags') or []]
     
     # Check various indicators
     indicators = [
         'Music' in categories,  # YouTube category
-        any(keyword in title for keyword in music_keywords),
-        any(keyword in description.split()[:50] for keyword in music_keywords),  # Check first 50 words
+        bool(MUSIC_KEYWORD_RE.search(title)),
+        not MUSIC_KEYWORD_SET.isdisjoint(description.split()[:50]),  # Check first 50 words
         any('music' in tag or 'song' in tag for tag in tags),
-        bool(re.search(r'(\d{4}|\d{2})', title))  # Year in title
+        bool(YEAR_RE.search(title))  # Year in title
     ]
     
     # If at least 2 indicators are True, it's likely music
     return sum(indicators) >= 2
 
+def classify_flat_entry(entry: dict) -> Optional[bool]:
+    """
+    First, cheap tier of the songs-only filter, using only flat playlist fields (title, duration, channel)
+    Returns: True for clear music, False for clear non-music, None when full metadata has to decide
+    """
+    if entry.get('live_status') in ('is_live', 'is_upcoming'):
+        return False
+    channel = (entry.get('channel') or entry.get('uploader') or '').lower()
+    if MUSIC_CHANNEL_RE.search(channel):
+        return True
+
+    title = (entry.get('title') or '').lower()
+    if MUSIC_KEYWORD_RE.search(title):
+        return None
+    duration = entry.get('duration')
+    if NON_MUSIC_RE.search(title):
+        # Song titles use these words too ("How To Save A Life"), a keyword alone isn't enough
+        if duration and not MUSIC_DURATION_RANGE[0] <= duration <= MUSIC_DURATION_RANGE[1]:
+            return False
+        return None
+    if duration and duration > MUSIC_DURATION_RANGE[1]:
+        return False
+    return None
+
+def reusable_info(video_info: dict) -> dict:
+    """Compact copy of a resolved info dict that the downloader can start from instead of extracting again"""
+    from yt_dlp import YoutubeDL
+    info = {key: value for key, value in video_info.items() if key not in UNUSED_INFO_KEYS}
+    # Same cleanup yt-dlp applies to --load-info-json input: drops the previous format selection and private keys
+    return YoutubeDL.sanitize_info(info, remove_private_keys=True)
 
 def extract_video_id(url: str) -> Optional[str]:
     """Extract video ID from various YouTube URL formats"""
@@ -139,7 +200,9 @@ def validate_url(url: str) -> Tuple[Optional[str], Optional[str], bool, str]:
     except Exception as e:
         return None, None, False, f"Error parsing URL: {str(e)}"
 
-def get_single_video_info(url: str) -> Optional[Media]:
+def get_single_video_info(url: str,
+                          cache: Optional[MetadataCache] = None,
+                          pool: YDLPool = shared_pool) -> Optional[Media]:
     """Extract information for a single video"""
     try:
         # First validate the URL
@@ -149,6 +212,15 @@ def get_single_video_info(url: str) -> Optional[Media]:
         if not video_id:
             raise ValueError("No video ID found in URL")
 
+        start = time.perf_counter()
+        if cache:
+            cached = cache.get(video_id)
+            if cached:
+                RESOLVE_SECONDS.observe(time.perf_counter() - start, source='cache')
+                tracer.record("cache_hit", start, time.perf_counter(), "metadata", video_id=video_id)
+                cached.media.is_from_metadata = False
+                return cached.media
+
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
@@ -156,123 +228,325 @@ def get_single_video_info(url: str) -> Optional[Media]:
             'ignoreerrors': True
         }
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with pool.acquire(ydl_opts) as ydl, tracer.span("extract_info", "metadata", video_id=video_id):
             video_info = ydl.extract_info(
                 f"https://www.youtube.com/watch?v={video_id}", 
                 download=False
             )
+            RESOLVE_SECONDS.observe(time.perf_counter() - start, source='network')
             
             if not video_info:
                 raise ValueError("Could not fetch video information")
 
             title = clean_title(video_info.get('title', ''))
-            return Media(
+            media = Media(
                 id=video_info['id'],
                 title=sanitize_filename(title),
-                duration=str(video_info.get('duration', '0')),
-                is_from_metadata=False
+                duration=video_info.get('duration'),
+                is_from_metadata=False,
+                info=reusable_info(video_info)
             )
+            if cache:
+                cache.put(media, video_info, is_likely_music(video_info))
+            return media
 
     except Exception as e:
         console.print(f"[red]Error processing video: {str(e)}[/red]")
         return None
 
+def _resolve_entry(record: Media,
+                   verdict: Optional[bool],
+                   ydl_opts: dict,
+                   playlist_name: Optional[str],
+                   songs_only: bool,
+                   cache: Optional[MetadataCache] = None,
+                   pool: YDLPool = shared_pool) -> Tuple[str, Optional[Media]]:
+    """
+    Fully resolve a single playlist entry, `verdict` is the songs-only prefilter's call on its flat data
+    Returns: (status, media) where status is 'ok', 'skipped', 'prefiltered' (skipped without extraction) or 'failed'
+    """
+    try:
+        # Clear cases are settled from the flat playlist data, before any extraction
+        verdict = verdict if songs_only else None
+        if verdict is False:
+            console.print(f"[yellow]Skipping non-music content: {record.title or record.id}")
+            return 'prefiltered', None
+
+        start = time.perf_counter()
+        cached = cache.get(record.id) if cache else None
+        if cached:
+            RESOLVE_SECONDS.observe(time.perf_counter() - start, source='cache')
+            tracer.record("cache_hit", start, time.perf_counter(), "metadata", video_id=record.id)
+            if songs_only and verdict is None and not cached.is_music:
+                console.print(f"[yellow]Skipping non-music content: {cached.media.title}")
+                return 'skipped', None
+            cached.media.is_from_metadata = False
+            cached.media.playlist_name = playlist_name
+            # Only the format list is cached, enough for the audio size but not the selected video formats
+            cached.media.video_bytes, cached.media.audio_bytes = format_sizes({'formats': cached.formats})
+            return 'ok', cached.media
+
+        video_url = f"https://www.youtube.com/watch?v={record.id}"
+        with pool.acquire(ydl_opts) as ydl, tracer.span("extract_info", "metadata", video_id=record.id):
+            video_info = ydl.extract_info(video_url, download=False)
+        RESOLVE_SECONDS.observe(time.perf_counter() - start, source='network')
+
+        if not video_info:
+            return 'failed', None
+
+        title = clean_title(video_info.get('title', ''))
+        media = Media(
+            id=video_info['id'],
+            title=sanitize_filename(title),
+            duration=video_info.get('duration'),
+            is_from_metadata=False,
+            playlist_name=playlist_name
+        )
+        is_music = is_likely_music(video_info)
+        if cache:
+            cache.put(media, video_info, is_music)
+
+        # Check if we're filtering for songs only
+        if songs_only and verdict is None and not is_music:
+            console.print(f"[yellow]Skipping non-music content: {video_info.get('title', '')}")
+            return 'skipped', None
+        media.info = reusable_info(video_info)
+        media.video_bytes, media.audio_bytes = format_sizes(video_info)
+
+        console.print(f"[green]Processed: {title}")
+        return 'ok', media
+
+    except Exception as e:
+        console.print(f"[yellow]Warning: Could not process video {record.id}: {str(e)}[/yellow]")
+        return 'failed', None
+
+def _playlist_ydl_opts(url: str) -> dict:
+    """yt-dlp options for listing a playlist and resolving its entries"""
+    # Special handling for Mix playlists
+    if 'RD' in url:
+        return {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'ignoreerrors': True,
+            'format': 'best'
+        }
+    return {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': True,
+        'ignoreerrors': True
+    }
+
+def _flat_records(entries: Iterable[Optional[dict]], playlist_name: str) -> Iterator[Tuple[Media, Optional[bool]]]:
+    """Compact record and songs-only prefilter verdict of each flat entry, dropping the entry dict itself"""
+    for entry in entries:
+        if not entry or not entry.get('id'):
+            continue
+        # Flat titles are raw, the manifest keeps one record per line
+        title = ' '.join((entry.get('title') or '').split())
+        yield Media(id=entry['id'], title=title, duration=entry.get('duration'),
+                    playlist_name=playlist_name), classify_flat_entry(entry)
+
+def _list_playlist(url: str, ydl_opts: dict, manifest: PlaylistManifest, ttl: float, pool: YDLPool) -> bool:
+    """
+    Enumerate the playlist into its manifest, unless a complete one younger than `ttl` exists.
+    Entries are taken from yt-dlp's unprocessed result, which pages through long listings
+    lazily, so they go to disk one at a time instead of being collected into a list first
+    Returns: False if the playlist could not be listed
+    """
+    if manifest.load(ttl):
+        reason = "to resume the interrupted run" if manifest.unfinished() else "-rl"
+        console.print(f"[cyan]Using the playlist listing from {manifest.age() / 60:.0f} min ago "
+                      f"({manifest.count} entries, {reason})")
+        return True
+
+    with pool.acquire(ydl_opts) as ydl, tracer.span("list_playlist", "metadata", url=url):
+        playlist_info = ydl.extract_info(url, download=False, process=False)
+        # Channel and handle URLs redirect to one of their tabs
+        for _ in range(MAX_LIST_REDIRECTS):
+            if not playlist_info or playlist_info.get('_type') not in ('url', 'url_transparent'):
+                break
+            playlist_info = ydl.extract_info(
+                playlist_info['url'], download=False, ie_key=playlist_info.get('ie_key'), process=False
+            )
+
+        if not playlist_info:
+            console.print("[red]Could not fetch playlist information[/red]")
+            return False
+
+        playlist_title = sanitize_filename(playlist_info.get('title') or '')
+        count = manifest.write(playlist_title, _flat_records(playlist_info.get('entries') or (), playlist_title))
+    console.print(f"[cyan]Listed {count} playlist entries")
+    return True
+
+def _select_entries(manifest: PlaylistManifest,
+                    playlist_name: str,
+                    reverse: bool,
+                    limit: Optional[int],
+                    archive: Optional[DownloadArchive],
+                    media_format: str,
+                    bitrate: str,
+                    sync: dict) -> Iterator[Tuple[Media, Optional[bool]]]:
+    """Apply -r/-n and the download archive to the manifest, reading it lazily"""
+    for record, verdict in manifest.entries(reverse=reverse, limit=limit):
+        if archive:
+            status = archive.status(record.id, media_format, bitrate, playlist_name)
+            if status == STATUS_DONE:
+                sync['archived'] += 1
+                continue
+            if status == STATUS_CHANGED:
+                sync['changed'] += 1
+        sync['pending'] += 1
+        yield record, verdict
+
+def _print_sync_summary(sync: dict):
+    console.print(f"[cyan]Sync: {sync['pending'] - sync['changed']} new, {sync['changed']} changed, "
+                  f"{sync['archived']} already downloaded")
+
+def _resolve_entries(entries: Iterable[Tuple[Media, Optional[bool]]],
+                     ydl_opts: dict,
+                     playlist_name: str,
+                     songs_only: bool,
+                     resolve_workers: int,
+                     cache: Optional[MetadataCache],
+                     pool: YDLPool,
+                     executor: Optional[ThreadPoolExecutor] = None) -> Iterator[Tuple[int, str, Optional[Media]]]:
+    """
+    Resolve entries on a bounded thread pool, or on `executor` when a long-running caller keeps one warm.
+    Only a few entries per worker are submitted ahead, so `entries` is read as resolution progresses
+    Yields: (playlist_index, status, media) in completion order
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, resolve_workers), thread_name_prefix="resolve") as executor:
+            yield from _resolve_entries(
+                entries, ydl_opts, playlist_name, songs_only, resolve_workers, cache, pool, executor
+            )
+        return
+
+    window = max(1, resolve_workers) * RESOLVE_AHEAD
+    entries = enumerate(entries)
+    futures = {}
+
+    def submit_more():
+        while len(futures) < window:
+            item = next(entries, None)
+            if item is None:
+                return
+            index, (record, verdict) = item
+            futures[executor.submit(
+                _resolve_entry, record, verdict, ydl_opts, playlist_name, songs_only, cache, pool
+            )] = index
+
+    try:
+        submit_more()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                status, media = future.result()
+                yield futures.pop(future), status, media
+            submit_more()
+    finally:
+        # A consumer that stops early (e.g. a cancelled job) leaves nothing queued behind
+        for future in futures:
+            future.cancel()
+
+def _print_resolve_summary(processed: int,
+                           total: int,
+                           skipped_count: int,
+                           failed_count: int,
+                           elapsed: float,
+                           resolve_workers: int,
+                           cache: Optional[MetadataCache],
+                           prefiltered_count: int = 0):
+    console.print(f"[green]Successfully processed {processed} items")
+    if total and elapsed > 0:
+        rate = total / elapsed
+        console.print(f"[cyan]Resolved {total} entries in {elapsed:.1f}s "
+                      f"({rate:.1f} items/s, {resolve_workers} workers)")
+    if cache and cache.hits:
+        console.print(f"[cyan]Metadata cache: {cache.hits} hits, {cache.misses} misses")
+    if skipped_count > 0:
+        console.print(f"[yellow]Skipped {skipped_count} non-music items "
+                      f"({prefiltered_count} from playlist data alone)")
+    if failed_count > 0:
+        console.print(f"[yellow]Failed to process {failed_count} items")
+
+@contextmanager
+def _playlist_manifest(url: str,
+                       ydl_opts: dict,
+                       manifest_dir: Optional[str],
+                       manifest_ttl: float,
+                       pool: YDLPool) -> Iterator[Optional[PlaylistManifest]]:
+    """The listed playlist's manifest, None if it could not be listed; kept in a temporary directory without `manifest_dir`"""
+    with (nullcontext(manifest_dir) if manifest_dir else tempfile.TemporaryDirectory(prefix="tube-manifest-")) as directory:
+        manifest = PlaylistManifest(manifest_path(directory, url))
+        yield manifest if _list_playlist(url, ydl_opts, manifest, manifest_ttl, pool) else None
+
 def get_playlist_media(url: str, 
                       playlist_name: Optional[str] = None,
                       reverse: bool = False, 
                       limit: Optional[int] = None,
-                      songs_only: bool = False) -> List[Media]:
-    """Extract media items from YouTube playlist"""
+                      songs_only: bool = False,
+                      resolve_workers: int = 8,
+                      cache: Optional[MetadataCache] = None,
+                      archive: Optional[DownloadArchive] = None,
+                      media_format: str = "audio",
+                      bitrate: str = '192',
+                      pool: YDLPool = shared_pool,
+                      executor: Optional[ThreadPoolExecutor] = None,
+                      manifest_dir: Optional[str] = None,
+                      manifest_ttl: float = 0) -> List[Media]:
+    """
+    Extract media items from YouTube playlist
+    Items already in the download archive for this format and bitrate are not resolved.
+    The listing is kept as a manifest in `manifest_dir` and reused for `manifest_ttl` seconds,
+    or when a download run working from it was cut short (see PlaylistManifest.mark_unfinished)
+    """
     try:
-        # Special handling for Mix playlists
-        if 'RD' in url:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': 'in_playlist',
-                'ignoreerrors': True,
-                'format': 'best'
-            }
-        else:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': True,
-                'ignoreerrors': True
-            }
-
-        media_items = []
-        failed_count = 0
-        skipped_count = 0  # Add counter for skipped non-music content
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            playlist_info = ydl.extract_info(url, download=False)
-            
-            if not playlist_info:
-                console.print("[red]Could not fetch playlist information[/red]")
+        ydl_opts = _playlist_ydl_opts(url)
+        with _playlist_manifest(url, ydl_opts, manifest_dir, manifest_ttl, pool) as manifest:
+            if manifest is None:
                 return []
+            playlist_name = playlist_name or manifest.title
+            sync = {'pending': 0, 'changed': 0, 'archived': 0}
 
-            # Use playlist title if no custom name provided
-            if not playlist_name:
-                playlist_name = sanitize_filename(playlist_info.get('title', ''))
+            failed_count = 0
+            skipped_count = 0  # Add counter for skipped non-music content
+            prefiltered_count = 0
+
+            # Results are stored by playlist position so the original order is kept
+            results: Dict[int, Media] = {}
+            start_time = time.perf_counter()
 
-            entries = playlist_info.get('entries', [])
-            valid_entries = [e for e in entries if e is not None]
-            
-            if reverse:
-                valid_entries = valid_entries[::-1]
-            
-            if limit:
-                valid_entries = valid_entries[:limit]
-            
             with Progress(
                 SpinnerColumn(),
                 TextColumn("[progress.description]{task.description}"),
                 console=console
             ) as progress:
-                task = progress.add_task("[cyan]Processing videos...", total=len(valid_entries))
-
-                for entry in valid_entries:
-                    try:
-                        if isinstance(entry, dict) and entry.get('url'):
-                            video_url = entry['url']
-                        else:
-                            video_url = f"https://www.youtube.com/watch?v={entry['id']}"
-                            
-                        video_info = ydl.extract_info(video_url, download=False)
-                        
-                        if video_info:
-                            # Check if we're filtering for songs only
-                            if songs_only:
-                                if not is_likely_music(video_info):
-                                    console.print(f"[yellow]Skipping non-music content: {video_info.get('title', '')}")
-                                    skipped_count += 1
-                                    progress.advance(task)
-                                    continue
-
-                            title = clean_title(video_info.get('title', ''))
-                            media = Media(
-                                id=video_info['id'],
-                                title=sanitize_filename(title),
-                                duration=str(video_info.get('duration', '0')),
-                                is_from_metadata=False,
-                                playlist_name=playlist_name
-                            )
-                            media_items.append(media)
-                            console.print(f"[green]Processed: {title}")
-                        else:
-                            failed_count += 1
-                    except Exception as e:
+                task = progress.add_task("[cyan]Processing videos...", total=min(limit or manifest.count, manifest.count))
+
+                for index, status, media in _resolve_entries(
+                    _select_entries(manifest, playlist_name, reverse, limit, archive, media_format, bitrate, sync),
+                    ydl_opts, playlist_name, songs_only, resolve_workers, cache, pool, executor
+                ):
+                    if status == 'ok':
+                        # Stored URLs expire before the downloads get far down a long list
+                        if index >= MAX_STORED_INFO_ITEMS:
+                            media.info = None
+                        results[index] = media
+                    elif status in ('skipped', 'prefiltered'):
+                        skipped_count += 1
+                        prefiltered_count += status == 'prefiltered'
+                    else:
                         failed_count += 1
-                        console.print(f"[yellow]Warning: Could not process video {entry.get('id', 'unknown')}: {str(e)}[/yellow]")
-                    finally:
-                        progress.advance(task)
+                    progress.advance(task)
 
-        console.print(f"[green]Successfully processed {len(media_items)} items")
-        if skipped_count > 0:
-            console.print(f"[yellow]Skipped {skipped_count} non-music items")
-        if failed_count > 0:
-            console.print(f"[yellow]Failed to process {failed_count} items")
+        media_items = [results[index] for index in sorted(results)]
+        if archive:
+            _print_sync_summary(sync)
+        _print_resolve_summary(len(media_items), sync['pending'], skipped_count, failed_count,
+                               time.perf_counter() - start_time, resolve_workers, cache, prefiltered_count)
 
         return media_items
 
@@ -280,9 +554,74 @@ def get_playlist_media(url: str,
         console.print(f"[red]Error processing playlist: {str(e)}[/red]")
         return []
 
-def process_url(url: str) -> Tuple[str, bool]:
+def iter_playlist_media(url: str,
+                        playlist_name: Optional[str] = None,
+                        reverse: bool = False,
+                        limit: Optional[int] = None,
+                        songs_only: bool = False,
+                        resolve_workers: int = 8,
+                        cache: Optional[MetadataCache] = None,
+                        archive: Optional[DownloadArchive] = None,
+                        media_format: str = "audio",
+                        bitrate: str = '192',
+                        pool: YDLPool = shared_pool,
+                        executor: Optional[ThreadPoolExecutor] = None,
+                        manifest_dir: Optional[str] = None,
+                        manifest_ttl: float = 0,
+                        raise_errors: bool = False) -> Iterator[Media]:
+    """
+    Streaming variant of get_playlist_media
+    Yields each Media as soon as it is resolved (completion order) so downloads
+    can start while the rest of the playlist is still being resolved; entries are
+    read from the manifest as resolution progresses, not held in memory.
+    With `raise_errors` a playlist that can't be listed raises instead of yielding nothing
+    """
+    try:
+        ydl_opts = _playlist_ydl_opts(url)
+        with _playlist_manifest(url, ydl_opts, manifest_dir, manifest_ttl, pool) as manifest:
+            if manifest is None:
+                if raise_errors:
+                    raise ValueError("Could not fetch playlist information")
+                return
+            playlist_name = playlist_name or manifest.title
+            sync = {'pending': 0, 'changed': 0, 'archived': 0}
+
+            processed_count = 0
+            failed_count = 0
+            skipped_count = 0
+            prefiltered_count = 0
+            start_time = time.perf_counter()
+
+            for index, status, media in _resolve_entries(
+                _select_entries(manifest, playlist_name, reverse, limit, archive, media_format, bitrate, sync),
+                ydl_opts, playlist_name, songs_only, resolve_workers, cache, pool, executor
+            ):
+                if status == 'ok':
+                    processed_count += 1
+                    # Same cap as get_playlist_media, a consumer may hold every item (e.g. to reorder them)
+                    if index >= MAX_STORED_INFO_ITEMS:
+                        media.info = None
+                    yield media
+                elif status in ('skipped', 'prefiltered'):
+                    skipped_count += 1
+                    prefiltered_count += status == 'prefiltered'
+                else:
+                    failed_count += 1
+
+        if archive:
+            _print_sync_summary(sync)
+        _print_resolve_summary(processed_count, sync['pending'], skipped_count, failed_count,
+                               time.perf_counter() - start_time, resolve_workers, cache, prefiltered_count)
+
+    except Exception as e:
+        if raise_errors:
+            raise
+        console.print(f"[red]Error processing playlist: {str(e)}[/red]")
+
+def process_url(url: str, prefer_playlist: Optional[bool] = None) -> Tuple[str, bool]:
     """
     Process YouTube URL and determine its type
+    For URLs with both a video and a playlist, `prefer_playlist` answers the question the user is asked otherwise
     Returns: (processed_url, is_playlist)
     """
     try:
@@ -305,10 +644,11 @@ def process_url(url: str) -> Tuple[str, bool]:
         # For regular playlists
         if playlist_id:
             if video_id:
-                message = "\n[yellow]This URL contains both a video and a playlist. "
-                message += "\nWould you like to download the entire playlist?[/yellow]"
-                
-                download_playlist = Confirm.ask(message)
+                download_playlist = prefer_playlist
+                if download_playlist is None:
+                    message = "\n[yellow]This URL contains both a video and a playlist. "
+                    message += "\nWould you like to download the entire playlist?[/yellow]"
+                    download_playlist = Confirm.ask(message)
                 if download_playlist:
                     return f"https://www.youtube.com/playlist?list={playlist_id}", True
                 return f"https://www.youtube.com/watch?v={video_id}", False